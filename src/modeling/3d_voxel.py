@@ -1,15 +1,55 @@
+import sys
 import numpy as np
-import open3d as o3d
 import time
+from contextlib import contextmanager
+
+from chunked_grid import ChunkedGrid
+from clearance_field import ClearanceField
+from exposure_field import ExposureField
+from line_of_sight import LineOfSight
+from occupancy_pyramid import OccupancyPyramid
+from profiling import PROFILER, timed
+from scene_spec import box_bounds, load_spec, primitives_to_boxes, rasterize, stairs_to_boxes
+from scene_cache import load_or_build
+
+try:
+    import open3d as o3d
+except ImportError:  # 无图形环境 (CI / 基准测试) 下仍可使用无头渲染数据接口
+    o3d = None
+
+# 状态 -> RGB 颜色查找表 (下标即体素状态)
+STATE_COLORS = np.array([
+    [1.0, 1.0, 1.0],    # 0: 迷雾 (不渲染)
+    [1.0, 1.0, 1.0],    # 1: 自由空间 (不渲染)
+    [0.6, 0.4, 0.2],    # 2: 内墙：棕色
+    [0.25, 0.25, 0.25], # 3: 外墙：深灰
+    [0.75, 0.75, 0.75], # 4: 地板/天花板：浅灰
+    [0.6, 0.2, 0.8],    # 5: 楼梯：紫色
+])
 
 class VoxelEnvironment:
-    def __init__(self, width=130, depth=80, height=30, res=0.5): 
+    def __init__(self, width=130, depth=80, height=30, res=0.5, storage='dense'): 
         self.res = res
         self.dims = np.array([width, depth, height])
         self.grid_shape = (self.dims / res).astype(int)
         
         # 0: 未知(迷雾), 1: 自由空间, 2: 内部墙, 3: 外围墙, 4: 地板/天花板
-        self.grid = np.zeros(self.grid_shape, dtype=np.int8)
+        # storage='chunked' 时使用分块稀疏存储 (高分辨率下内存随场景复杂度而非包围盒体积增长)
+        if storage == 'chunked':
+            self.grid = ChunkedGrid(self.grid_shape, dtype=np.int8)
+        else:
+            self.grid = np.zeros(self.grid_shape, dtype=np.int8)
+        # 地图版本号：任何体素状态变化 (add_block / 扫描揭示) 都会递增，用于缓存失效
+        self.version = 0
+        self._los = None
+        self._pyramid = None
+        self._clearance = None
+        # 时变暴露代价层 (动态信息场)，默认关闭，enable_exposure() 启用后由扫描累加
+        self.exposure = None
+        # 实时查看器 (LiveViewer 构造时挂接)，体素变化时登记脏体素，逐帧局部刷新
+        self.viewer = None
+        # 批量构建期间记录的场景图元 (见 batch())
+        self._batch = None
 
         # 默认起终点位置
         self.start = np.array([20.0, 30.0, 1.0]) 
@@ -22,20 +62,148 @@ class VoxelEnvironment:
             'show_outer_wall': True
         }
 
+        # 间距场配置：迷雾是否视为障碍 (保守)，距离截断上限 (体素单位)
+        self.clearance_config = {
+            'fog_blocking': False,
+            'max_dist': 16
+        }
+
     def add_block(self, start_xyz, size_xyz, state=2):
-        s = (np.array(start_xyz) / self.res).astype(int)
-        sz = (np.array(size_xyz) / self.res).astype(int)
-        e = np.minimum(s + sz, self.grid_shape)
+        if self._batch is not None:
+            self._batch.append({'type': 'box', 'start': [float(v) for v in start_xyz],
+                                'size': [float(v) for v in size_xyz], 'state': int(state)})
+            return
+        # 单个盒用纯 Python 整数换算 (与 box_bounds 的取整 / 裁剪规则一致)，避免小数组分配
+        res, shape = self.res, self.grid_shape
+        s = [max(int(v / res), 0) for v in start_xyz]
+        e = [min(int(a / res) + int(b / res), int(n)) for a, b, n in zip(start_xyz, size_xyz, shape)]
+        if e[0] <= s[0] or e[1] <= s[1] or e[2] <= s[2]:
+            return
         self.grid[s[0]:e[0], s[1]:e[1], s[2]:e[2]] = state
+        self._box_written(s, e, 1)
+
+    def add_blocks(self, starts, sizes, states):
+        # 批量写入 N 个盒：坐标换算与裁剪一次完成，按顺序写入 (后写覆盖先写)
+        # 衍生结构 (金字塔 / 间距场 / 查看器) 按写入区域的并集包围盒更新一次
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3)
+        states = np.broadcast_to(np.asarray(states, dtype=np.int8), len(starts))
+        if self._batch is not None:
+            # 批量构建期间同样只记录图元，保持与 add_block 的先后覆盖顺序
+            sizes = np.broadcast_to(np.asarray(sizes, dtype=np.float64), starts.shape)
+            self._batch.extend({'type': 'box', 'start': a, 'size': b, 'state': c}
+                               for a, b, c in zip(starts.tolist(), sizes.tolist(), states.tolist()))
+            return
+        lo, hi = box_bounds(starts, sizes, self.res, self.grid_shape)
+        box = rasterize(self.grid, lo, hi, states)
+        if box is not None:
+            self._box_written(*box, len(starts))
+
+    def _box_written(self, s, e, count):
+        self.version += 1
+        PROFILER.count('env.add_block', count)
+        if self._pyramid is not None:
+            self._pyramid.update_box(s, e)
+        if self._clearance is not None:
+            self._clearance.update_box(s, e)
+        if self.viewer is not None:
+            self.viewer.mark_box(s, e)
+
+    def notify_changed(self, indices):
+        # 外部 (如扫描) 直接修改 grid 后调用，indices 为变化体素的扁平下标
+        if len(indices):
+            self.version += 1
+            PROFILER.count('env.changed_cells', len(indices))
+            if self._pyramid is not None:
+                self._pyramid.update_cells(indices)
+            if self._clearance is not None:
+                self._clearance.update_cells(indices)
+            if self.viewer is not None:
+                self.viewer.mark_cells(indices)
+
+    @property
+    def pyramid(self):
+        # 多级占据金字塔 (首次访问时构建，之后随 add_block / notify_changed 增量更新)
+        if self._pyramid is None or self._pyramid.grid is not self.grid:
+            self._pyramid = OccupancyPyramid(self.grid)
+        return self._pyramid
+
+    @property
+    def clearance_field(self):
+        # 到最近障碍物的欧氏距离场 (首次访问时构建，之后随 add_block / notify_changed 增量更新)
+        cfg = self.clearance_config
+        f = self._clearance
+        if (f is None or f.grid is not self.grid or f.fog_blocking != cfg['fog_blocking']
+                or f.max_dist != cfg['max_dist']):
+            self._clearance = ClearanceField(self.grid, self.res, **cfg)
+        return self._clearance
+
+    def enable_exposure(self, **kwargs):
+        # 启用时变暴露代价层，参数见 ExposureField (half_life / tick / max_value)
+        self.exposure = ExposureField(self.grid_shape, **kwargs)
+        return self.exposure
+
+    def line_of_sight(self, a, b):
+        # 批量视线查询：a, b 为 (N, 3) 世界坐标端点，返回 (N,) 布尔可见性 (状态 2~5 遮挡)
+        if self._los is None:
+            self._los = LineOfSight(self)
+        return self._los.query(a, b)
 
     def add_stairs(self, start_xyz, size_xyz, height):
-        step_h = 0.5
-        num_steps = int(height / step_h)
-        for i in range(num_steps):
-            step_pos = [start_xyz[0], start_xyz[1] + i * 0.5, start_xyz[2] + i * step_h]
-            self.add_block(step_pos, [size_xyz[0], size_xyz[1], step_h], state=5)
-
+        if self._batch is not None:
+            self._batch.append({'type': 'stairs', 'start': [float(v) for v in start_xyz],
+                                'size': [float(v) for v in size_xyz], 'height': float(height)})
+            return
+        starts, sizes = stairs_to_boxes(start_xyz, size_xyz, height)
+        self.add_blocks(starts, sizes, 5)
+
+    @contextmanager
+    def batch(self, apply=True):
+        # 批量构建：期间 add_block / add_stairs 只记录图元，退出时一次性栅格化 (可嵌套，仅最外层生效)
+        # apply=False 时只记录不写入 (用于导出场景描述)
+        if self._batch is not None:
+            yield self._batch
+            return
+        self._batch = []
+        try:
+            yield self._batch
+            primitives = self._batch
+        finally:
+            self._batch = None
+        if apply:
+            self.add_blocks(*primitives_to_boxes(primitives))
+
+    # --- 声明式场景 ---
+    def apply_scene(self, spec):
+        # 按场景描述 (dict) 写入全部图元；描述中的起终点覆盖默认值
+        if 'start' in spec:
+            self.start = np.array(spec['start'], dtype=np.float64)
+        if 'goal' in spec:
+            self.goal = np.array(spec['goal'], dtype=np.float64)
+        self.add_blocks(*primitives_to_boxes(spec['primitives']))
+
+    @classmethod
+    def from_scene(cls, spec, res=0.5, storage='dense'):
+        # spec 为场景描述 dict 或 JSON 文件路径；场景尺寸取自描述 (缺省为默认尺寸)
+        if not isinstance(spec, dict):
+            spec = load_spec(spec)
+        env = cls(*spec.get('dims', (130, 80, 30)), res=res, storage=storage)
+        env.apply_scene(spec)
+        return env
+
+    def export_scene(self, builder='create_custom_scene'):
+        # 运行构建函数但只记录图元，返回可保存为 JSON 的场景描述 (不修改 grid)
+        with self.batch(apply=False) as primitives:
+            getattr(self, builder)()
+        return {'dims': self.dims.tolist(), 'start': self.start.tolist(), 'goal': self.goal.tolist(),
+                'primitives': primitives}
+
+    @timed('env.create_custom_scene')
     def create_custom_scene(self):
+        # 内置场景：图元先记录，再一次性批量栅格化
+        with self.batch():
+            self._custom_scene()
+
+    def _custom_scene(self):
         # 1. 基础大基座地面 (厚度1m)
         self.add_block([0, 0, 0], [self.dims[0], self.dims[1], 1], state=4)
 
@@ -308,67 +476,79 @@ class VoxelEnvironment:
         self.add_block([east_x+27, base_y+21, 6], [4, 1, 5], state=2)  # 内墙
         self.add_block([east_x+5, base_y+9, 6], [1, 9.5, 5], state=2)  # 内墙
 
-    def visualize(self):
+    def render_mask(self):
+        # --- 1. 实体体素 ---
+        grid = np.asarray(self.grid)
+        mask = grid > 1
+
+        # --- 2. 外墙独立控制 (最高优先级) ---
+        if not self.render_config['show_outer_wall']:
+            mask &= grid != 3
+
+        # --- 3. 楼层绑定逻辑 (按体素底部物理高度逐层过滤) ---
+        # 地基 (Z < 1.0m) 与 1F 内部 (1.0m <= Z < 6.0m) 跟随 show_1f
+        # 2F 内部 (Z >= 6.0m) 包含 2F 地板(天花板) 和 2F 内墙，跟随 show_2f
+        mask &= self._layer_on()[None, None, :]
+        return mask
+
+    def _layer_on(self):
+        phys_z = np.arange(self.grid_shape[2]) * self.res
+        return np.where(phys_z < 6.0, self.render_config['show_1f'], self.render_config['show_2f'])
+
+    def render_cells(self, cells):
+        # render_mask 的逐体素版本 (供实时查看器局部刷新)：cells 为 (N, 3) 下标，网格外视为不渲染
+        # 返回 (N,) 渲染状态 (不渲染为 0) 与 (N, 3) 颜色
+        cells = np.asarray(cells)
+        inside = np.all((cells >= 0) & (cells < self.grid_shape), axis=1)
+        states = np.zeros(len(cells), dtype=np.int8)
+        states[inside] = self.grid.take(np.ravel_multi_index(tuple(cells[inside].T), tuple(self.grid_shape)))
+        mask = states > 1
+        if not self.render_config['show_outer_wall']:
+            mask &= states != 3
+        mask[inside] &= self._layer_on()[cells[inside, 2]]
+        states[~mask] = 0
+        return states, STATE_COLORS[states]
+
+    @staticmethod
+    def surface_mask(mask):
+        # 仅保留暴露表面：6 邻域中至少有一个非实体 (网格外视为非实体)
+        padded = np.pad(mask, 1, constant_values=False)
+        interior = padded[2:, 1:-1, 1:-1] & padded[:-2, 1:-1, 1:-1]
+        interior &= padded[1:-1, 2:, 1:-1] & padded[1:-1, :-2, 1:-1]
+        interior &= padded[1:-1, 1:-1, 2:] & padded[1:-1, 1:-1, :-2]
+        return mask & ~interior
+
+    @timed('env.prepare_render_data')
+    def prepare_render_data(self, surface_only=False):
+        # 无头渲染数据接口：返回体素中心点 (N, 3) 与颜色 (N, 3)，不创建窗口
+        mask = self.render_mask()
+        if surface_only:
+            mask = self.surface_mask(mask)
+
+        # --- 4. 颜色分配 (状态查表) ---
+        indices = np.argwhere(mask)
+        points = indices * self.res + self.res / 2.0
+        colors = STATE_COLORS[np.asarray(self.grid)[mask]]
+        PROFILER.count('render.voxels', len(points))
+        return points, colors
+
+    def visualize(self, surface_only=False):
+        # surface_only=True 时只绘制暴露表面 (体素数大幅减少，外观不变)
+        if o3d is None:
+            raise ImportError("visualize() 需要 open3d：请先 pip install open3d，或使用 --headless 只构建渲染数据")
         print("开始构建地图渲染数据...")
         start_time = time.time()
-        
-        all_indices = np.argwhere(self.grid > 1)
-        valid_indices, valid_colors = [], []
-
-        for idx in all_indices:
-            # 计算体素底部的物理高度
-            phys_z = idx[2] * self.res
-            state = self.grid[idx[0], idx[1], idx[2]]
-            
-            # --- 1. 外墙独立控制 (最高优先级) ---
-            if state == 3 and not self.render_config['show_outer_wall']:
-                continue
-
-            # --- 2. 地基逻辑 (Z < 1.0m) ---
-            # 地基作为地图基座，只要 show_1f 开启就显示，或者设定为永久显示
-            if phys_z < 1.0:
-                if not self.render_config['show_1f']: # 如果连 1F 都不看，通常底座也不看
-                    continue
-                # 否则直接进入颜色分配，不参与后面的楼层过滤
-            
-            else:
-                # --- 3. 楼层绑定逻辑 ---
-                
-                # 1F 内部内容 (1.0m <= Z < 6.0m)
-                # 包含 1F 内墙
-                if 1.0 <= phys_z < 6.0:
-                    if not self.render_config['show_1f']:
-                        continue
-                
-                # 2F 内部内容 (Z >= 6.0m)
-                # 包含 2F 地板(天花板) 和 2F 内墙
-                if phys_z >= 6.0:
-                    if not self.render_config['show_2f']:
-                        continue
-
-            # --- 4. 颜色分配 ---
-            if state == 3: 
-                color = [0.25, 0.25, 0.25] # 外墙：深灰
-            elif state == 2: 
-                color = [0.6, 0.4, 0.2]    # 内墙：棕色
-            elif state == 4: 
-                color = [0.75, 0.75, 0.75] # 地板/天花板：浅灰
-            elif state == 5:
-                color = [0.6, 0.2, 0.8]    # 楼梯：紫色
-            else: 
-                color = [1.0, 1.0, 1.0]
-                
-            valid_indices.append(idx)
-            valid_colors.append(color)
-
-        if not valid_indices:
+
+        points, colors = self.prepare_render_data(surface_only=surface_only)
+
+        if len(points) == 0:
             print("警告：没有可渲染的体素。")
             return
 
         # --- 5. Open3D 渲染 ---
         pcd = o3d.geometry.PointCloud()
-        pcd.points = o3d.utility.Vector3dVector(np.array(valid_indices) * self.res + self.res / 2.0)
-        pcd.colors = o3d.utility.Vector3dVector(np.array(valid_colors))
+        pcd.points = o3d.utility.Vector3dVector(points)
+        pcd.colors = o3d.utility.Vector3dVector(colors)
         v_grid = o3d.geometry.VoxelGrid.create_from_point_cloud(pcd, voxel_size=self.res)
 
         s_node = o3d.geometry.TriangleMesh.create_sphere(radius=1.5); s_node.paint_uniform_color([0.2, 0.8, 0.2]); s_node.translate(self.start)
@@ -384,10 +564,17 @@ class VoxelEnvironment:
         opt.background_color = np.asarray([0.05, 0.05, 0.05])
         vis.get_view_control().set_zoom(0.4)
         
-        print(f"地图构建完成！渲染体素: {len(valid_indices)} | 耗时: {process_time:.4f}s")
+        print(f"地图构建完成！渲染体素: {len(points)} | 耗时: {process_time:.4f}s")
         vis.run(); vis.destroy_window()
 
 if __name__ == "__main__":
-    env = VoxelEnvironment()
-    env.create_custom_scene()
-    env.visualize()
\ No newline at end of file
+    # 命中场景缓存时直接内存映射加载，场景定义变化后自动重建
+    env = load_or_build(env_cls=VoxelEnvironment)
+
+    if '--headless' in sys.argv:
+        # 无头模式：只构建渲染数据并输出统计，用于基准测试 / CI
+        t0 = time.time()
+        points, colors = env.prepare_render_data(surface_only='--full' not in sys.argv)
+        print(f"渲染数据构建完成！体素: {len(points)} | 耗时: {time.time() - t0:.4f}s")
+    else:
+        env.visualize()
\ No newline at end of file
@@ -0,0 +1,93 @@
+import importlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from grid_planner import PASSABLE_STATES, GridPlanner
+from occupancy_pyramid import OccupancyPyramid
+
+# 工作进程内的规划器 (每个进程初始化一次，之后复用于所有查询)
+_worker = {}
+
+
+def _init_worker(shm_name, shape, dtype, res, passable, coarse):
+    # 挂接共享内存中的网格 (不复制)，构建本进程的规划器；共享内存句柄需保持引用，否则视图失效
+    shm = shared_memory.SharedMemory(name=shm_name)
+    grid = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    pyramid = OccupancyPyramid(grid) if coarse else None
+    _worker['shm'] = shm
+    _worker['planner'] = GridPlanner(grid, res, passable, pyramid)
+
+
+def _plan_chunk(index, starts, goals, method, coarse_level):
+    planner = _worker['planner']
+    return [(i, planner.plan(s, g, method=method, coarse_level=coarse_level))
+            for i, s, g in zip(index, starts, goals)]
+
+
+def plan_many(env, starts, goals, method='theta', coarse_level=None, workers=None, chunksize=1,
+              passable=PASSABLE_STATES):
+    # 批量规划：starts / goals 为 (N, 3) 世界坐标。网格只通过共享内存发布一次，
+    # 查询分发到进程池 (默认进程数 = CPU 核数)，按完成顺序逐个产出 (查询序号, PlanResult)
+    # 内存：网格在共享内存中只有一份，但每个进程各自持有规划器的搜索缓冲区 (约 21 字节/体素，
+    # 见 GridPlanner.nbytes) 与粗到细所需的占据金字塔，总量随 workers 线性增长，内存受限时应减小 workers。
+    # 提前停止迭代 (break / close) 时取消尚未开始的查询，只等待正在执行的分块结束
+    starts = np.atleast_2d(np.asarray(starts, dtype=np.float64))
+    goals = np.atleast_2d(np.asarray(goals, dtype=np.float64))
+    if starts.shape != goals.shape:
+        raise ValueError(f"起终点数量不一致: {starts.shape} vs {goals.shape}")
+    workers = workers or os.cpu_count() or 1
+
+    grid = env.grid
+    dtype = np.dtype(grid.dtype)
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(grid.shape)) * dtype.itemsize, 1))
+    pool = None
+    try:
+        # 按 x 方向分段写入共享内存，分块存储 (ChunkedGrid) 不需要先展开成完整的稠密副本
+        shared = np.ndarray(grid.shape, dtype=dtype, buffer=shm.buf)
+        for x0 in range(0, grid.shape[0], 16):
+            shared[x0:x0 + 16] = grid[x0:x0 + 16, :, :]
+        del shared
+        initargs = (shm.name, grid.shape, dtype.str, env.res, tuple(passable), coarse_level is not None)
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs)
+        futures = [pool.submit(_plan_chunk, list(range(i, min(i + chunksize, len(starts)))),
+                               starts[i:i + chunksize], goals[i:i + chunksize], method, coarse_level)
+                   for i in range(0, len(starts), chunksize)]
+        for fut in as_completed(futures):
+            yield from fut.result()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        shm.close()
+        shm.unlink()
+
+
+if __name__ == "__main__":
+    VoxelEnvironment = importlib.import_module('3d_voxel').VoxelEnvironment
+    env = VoxelEnvironment()
+    env.create_custom_scene()
+
+    # 随机起终点对：从一层 / 二层离地 1~1.5m 的可通行体素中采样
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    rng = np.random.default_rng(0)
+    layers = np.isin(np.arange(env.grid_shape[2]) * env.res, [2.0, 2.5, 8.0, 8.5])
+    cand = np.argwhere(np.isin(env.grid, PASSABLE_STATES) & layers)
+    starts, goals = (cand[rng.integers(len(cand), size=(2, n))] + 0.5) * env.res
+
+    cores = os.cpu_count() or 1
+    planner = GridPlanner(env.grid, env.res)
+    grid_bytes = env.grid.size * np.dtype(env.grid.dtype).itemsize
+    print(f"[批量规划] 每进程规划器缓冲: {planner.nbytes / 2**20:.1f}MB | 共享网格: {grid_bytes / 2**20:.1f}MB")
+    del planner
+    for workers in sorted({1, 2, cores}):
+        t0 = time.perf_counter()
+        results = dict(plan_many(env, starts, goals, method='astar', coarse_level=1, workers=workers))
+        elapsed = time.perf_counter() - t0
+        found = sum(r.found for r in results.values())
+        expanded = sum(r.expanded for r in results.values())
+        print(f"[批量规划] 进程: {workers} | 查询: {n} (有解 {found}) | 扩展节点: {expanded} | "
+              f"总耗时: {elapsed:.2f}s | 吞吐: {n / elapsed:.1f} 次/s")
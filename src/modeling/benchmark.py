@@ -0,0 +1,175 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from dif_scan import SectorScanner
+from grid_planner import GridPlanner
+from profiling import PROFILER
+
+DEFAULT_RES = (1.0, 0.5, 0.25, 0.1)
+# 沿西楼一层走廊的扫描轨迹 [x, y, z, yaw]
+SCAN_TRAJECTORY = np.column_stack([np.arange(16.0, 60.0, 4.0), np.full(11, 45.0), np.full(11, 1.8), np.zeros(11)])
+
+
+def _measure(fn, repeat):
+    # 重复 repeat 次，返回 (最后一次的返回值, 各次耗时)
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return out, times
+
+
+def _timing(times):
+    return {'min_s': min(times), 'median_s': statistics.median(times), 'runs': len(times)}
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def bench_resolution(env_cls, res, storage='dense', repeat=3, max_plan_cells=20_000_000,
+                     methods=('astar', 'theta')):
+    # 单一分辨率下的全部测量项，返回可 JSON 序列化的字典
+    PROFILER.reset()
+    row = {'res': res, 'storage': storage}
+
+    def build():
+        env = env_cls(res=res, storage=storage)
+        env.create_custom_scene()
+        return env
+
+    env, times = _measure(build, repeat)
+    grid = env.grid
+    row['grid_shape'] = [int(v) for v in grid.shape]
+    row['cells'] = int(np.prod(grid.shape))
+    row['grid_bytes'] = int(grid.nbytes)
+    row['scene_build'] = _timing(times)
+
+    for surface_only in (True, False):
+        (points, _), times = _measure(lambda: env.prepare_render_data(surface_only=surface_only), repeat)
+        row['render_surface' if surface_only else 'render_full'] = dict(_timing(times), voxels=len(points))
+
+    # 扫描会原地揭示迷雾：每次测量前恢复原始网格
+    original = np.array(grid, copy=True)
+    scanner = SectorScanner(res)
+
+    def scan():
+        env.grid = original.copy() if storage == 'dense' else type(grid).from_dense(original)
+        return scanner.scan(env, SCAN_TRAJECTORY)
+
+    changed, times = _measure(scan, repeat)
+    row['scan'] = dict(_timing(times), poses=len(SCAN_TRAJECTORY), rays=scanner.last_rays,
+                       steps=scanner.last_steps, revealed=len(changed))
+    env.grid = grid
+
+    if row['cells'] <= max_plan_cells:
+        planner, times = _measure(lambda: GridPlanner.from_env(env), 1)
+        row['plan_setup'] = _timing(times)
+        plans = {}
+        for method in methods:
+            for level in (None, 1):
+                r, times = _measure(lambda: planner.plan(env.start, env.goal, method=method, coarse_level=level),
+                                    repeat)
+                key = method if level is None else f"{method}_coarse{2 ** level}x"
+                plans[key] = dict(_timing(times), found=bool(r.found), cost_m=float(r.cost), expanded=r.expanded)
+        row['plan'] = plans
+    else:
+        row['plan'] = {'skipped': f"cells > max_plan_cells ({max_plan_cells})"}
+
+    row['profile'] = PROFILER.snapshot()
+    return row
+
+
+def run(res_list=DEFAULT_RES, storage='dense', repeat=3, max_plan_cells=20_000_000):
+    env_cls = importlib.import_module('3d_voxel').VoxelEnvironment
+    was_enabled = PROFILER.enabled
+    PROFILER.enabled = True
+    try:
+        results = []
+        for res in res_list:
+            results.append(bench_resolution(env_cls, res, storage, repeat, max_plan_cells))
+            print(f"[基准] res={res} 完成", file=sys.stderr)
+    finally:
+        PROFILER.enabled = was_enabled
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def _flatten(d, prefix=''):
+    # 嵌套字典 -> {'a.b.c': 数值}，只保留数值项，供跨提交对比
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + '.'))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+
+def compare(old, new, threshold=1.10):
+    # 对比两份基准结果 (按 res + storage 配对)，打印变化超过阈值的耗时项
+    base = {(r['res'], r['storage']): _flatten(r) for r in old['results']}
+    for row in new['results']:
+        ref = base.get((row['res'], row['storage']))
+        if ref is None:
+            continue
+        for key, v in _flatten(row).items():
+            if not key.endswith(('min_s', 'grid_bytes', 'expanded')) or key.startswith('profile.'):
+                continue
+            r0 = ref.get(key)
+            if not r0:
+                continue
+            ratio = v / r0
+            if ratio > threshold or ratio < 1 / threshold:
+                tag = '变慢' if ratio > 1 else '变快'
+                print(f"res={row['res']:<5} {key:<40} {r0:.4g} -> {v:.4g} ({ratio:.2f}x {tag})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="场景构建 / 渲染准备 / 扫描 / 规划基准测试")
+    parser.add_argument('--res', type=float, nargs='+', default=list(DEFAULT_RES))
+    parser.add_argument('--storage', choices=('dense', 'chunked'), default='dense')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-plan-cells', type=int, default=20_000_000)
+    parser.add_argument('--out', help="结果 JSON 路径 (默认输出到标准输出)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="对比两份结果 JSON")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f0, open(args.compare[1]) as f1:
+            compare(json.load(f0), json.load(f1))
+        sys.exit(0)
+
+    report = run(args.res, args.storage, args.repeat, args.max_plan_cells)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
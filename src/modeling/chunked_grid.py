@@ -0,0 +1,306 @@
+import importlib
+import sys
+import time
+
+import numpy as np
+
+
+class ChunkedGrid:
+    # 分块稀疏体素存储：网格切分为 B³ 砖块，状态一致的砖块只存一个值，混合砖块才存稠密数据
+    # 对外保持与 np.ndarray 相同的切片读写语义 (add_block 无需修改)，并提供砖块级快速判断
+
+    def __init__(self, shape, brick=16, dtype=np.int8, fill=0):
+        self.shape = tuple(int(v) for v in shape)
+        self.dtype = np.dtype(dtype)
+        self.ndim = 3
+        self.size = int(np.prod(self.shape))
+        self.brick = brick
+        self.bshape = tuple(-(-n // brick) for n in self.shape)
+
+        self.values = np.full(self.bshape, fill, dtype=self.dtype)   # 均匀砖块的状态值
+        self.dense = np.zeros(self.bshape, dtype=bool)               # 是否为混合砖块
+        # 混合砖块的稠密数据连续存放在 pool 中 (slot 为其槽位，均匀砖块为 -1)，
+        # 扁平下标读写可一次 gather / scatter 完成；payload 为砖块坐标 -> pool 视图
+        self.slot = np.full(self.bshape, -1, dtype=np.int32)
+        self.pool = np.empty((0,) + (brick,) * 3, dtype=self.dtype)
+        self.payload = {}
+        self._free_slots = []
+
+    # --- 统计 ---
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.dense.nbytes + self.slot.nbytes + self.pool.nbytes
+
+    def __len__(self):
+        return self.shape[0]
+
+    # --- 砖块级快速路径 ---
+    def brick_of(self, cell):
+        return tuple(int(c) // self.brick for c in cell)
+
+    def brick_state(self, bidx):
+        # 均匀砖块返回其状态值，混合砖块返回 None
+        return None if self.dense[bidx] else int(self.values[bidx])
+
+    def uniform_mask(self, states):
+        # 砖块级布尔数组：该砖块整块均为 states 中的某个状态 (供规划 / 扫描整块跳过)
+        return ~self.dense & np.isin(self.values, states)
+
+    def isin(self, states):
+        # 等价于 np.isin(grid, states)
+        return self.mask(lambda a: np.isin(a, states))
+
+    def mask(self, fn):
+        # 等价于 fn(np.asarray(grid))，fn 为逐元素布尔函数：均匀砖块按单值整块展开，
+        # 只有混合砖块逐体素判断，不需要先构造稠密的状态网格
+        b = self.brick
+        (bx, by, bz), (x, y, z) = self.bshape, self.shape
+        out = np.empty((bx, b, by, b, bz, b), dtype=bool)
+        bricks = out.transpose(0, 2, 4, 1, 3, 5)
+        bricks[...] = fn(self.values)[..., None, None, None]
+        if self.payload:
+            bricks[self.dense] = fn(self.pool[self.slot[self.dense]])
+        return out.reshape(bx * b, by * b, bz * b)[:x, :y, :z]
+
+    def is_brick_free(self, bidx, free_states=(0, 1)):
+        return not self.dense[bidx] and int(self.values[bidx]) in free_states
+
+    def is_brick_solid(self, bidx, min_solid=2):
+        return not self.dense[bidx] and int(self.values[bidx]) >= min_solid
+
+    def _materialize(self, b):
+        arr = self.payload.get(b)
+        if arr is None:
+            if not self._free_slots:
+                self._grow(max(8, len(self.pool) // 2))
+            k = self._free_slots.pop()
+            arr = self.pool[k]
+            arr[...] = self.values[b]
+            self.slot[b] = k
+            self.dense[b] = True
+            self.payload[b] = arr
+        return arr
+
+    def _grow(self, extra):
+        # 扩容 pool 并重建 payload 视图
+        n = len(self.pool)
+        pool = np.empty((n + extra,) + self.pool.shape[1:], dtype=self.dtype)
+        pool[:n] = self.pool
+        self.pool = pool
+        self._free_slots.extend(range(n + extra - 1, n - 1, -1))
+        self.payload = {b: pool[self.slot[b]] for b in self.payload}
+
+    def _release(self, b):
+        # 砖块退回均匀存储，槽位留给后续混合砖块复用
+        self._free_slots.append(int(self.slot[b]))
+        self.slot[b] = -1
+        self.dense[b] = False
+        del self.payload[b]
+
+    def _collapse(self, b):
+        # 写入后若砖块 (网格范围内的部分) 变为均匀则退回单值存储
+        arr = self.payload[b]
+        ext = np.minimum(self.brick, np.array(self.shape) - np.array(b) * self.brick)
+        arr = arr[:ext[0], :ext[1], :ext[2]]
+        v = arr.flat[0]
+        if (arr == v).all():
+            self._release(b)
+            self.values[b] = v
+
+    # --- 盒区域读写 (切片语义) ---
+    def _box(self, key):
+        # 把 (slice/int, ...) 规范成 [lo, hi) 盒；返回 None 表示需要退回稠密路径
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) > 3 or any(k is Ellipsis for k in key):
+            return None
+        key = key + (slice(None),) * (3 - len(key))
+        lo, hi, squeeze = [], [], []
+        for axis, k in enumerate(key):
+            n = self.shape[axis]
+            if isinstance(k, slice):
+                start, stop, step = k.indices(n)
+                if step != 1:
+                    return None
+                lo.append(start)
+                hi.append(max(stop, start))
+            elif isinstance(k, (int, np.integer)):
+                k = int(k) + n if k < 0 else int(k)
+                if not 0 <= k < n:
+                    raise IndexError(f"index {k} is out of bounds for axis {axis} with size {n}")
+                lo.append(k)
+                hi.append(k + 1)
+                squeeze.append(axis)
+            else:
+                return None
+        return np.array(lo), np.array(hi), tuple(squeeze)
+
+    def _brick_ranges(self, lo, hi):
+        b = self.brick
+        return [range(lo[i] // b, -(-hi[i] // b)) for i in range(3)]
+
+    def fill_box(self, lo, hi, value):
+        lo, hi = np.asarray(lo), np.asarray(hi)
+        if np.any(hi <= lo):
+            return
+        b = self.brick
+        value = self.dtype.type(value)
+
+        # 被完整覆盖的砖块整块置为均匀值 (丢弃稠密数据)
+        full_lo = -(-lo // b)
+        full_hi = np.where(hi >= np.array(self.shape), np.array(self.bshape), hi // b)
+        if np.all(full_hi > full_lo):
+            sl = tuple(slice(full_lo[i], full_hi[i]) for i in range(3))
+            for idx in np.argwhere(self.dense[sl]) + full_lo:
+                self._release(tuple(idx.tolist()))
+            self.values[sl] = value
+
+        # 部分覆盖的砖块逐块写入
+        rx, ry, rz = self._brick_ranges(lo, hi)
+        for bx in rx:
+            for by in ry:
+                for bz in rz:
+                    bidx = (bx, by, bz)
+                    o = np.array(bidx) * b
+                    s = np.maximum(lo, o) - o
+                    e = np.minimum(hi, o + b) - o
+                    clipped_full = np.all(s == 0) and np.all((e == b) | (o + e >= self.shape))
+                    if clipped_full:
+                        continue
+                    if not self.dense[bidx] and self.values[bidx] == value:
+                        continue
+                    arr = self._materialize(bidx)
+                    arr[s[0]:e[0], s[1]:e[1], s[2]:e[2]] = value
+                    self._collapse(bidx)
+
+    def read_box(self, lo, hi):
+        lo, hi = np.asarray(lo), np.asarray(hi)
+        out = np.empty(np.maximum(hi - lo, 0), dtype=self.dtype)
+        if out.size == 0:
+            return out
+        b = self.brick
+        blo = lo // b
+        bhi = -(-hi // b)
+        sub_vals = self.values[blo[0]:bhi[0], blo[1]:bhi[1], blo[2]:bhi[2]]
+        sub_dense = self.dense[blo[0]:bhi[0], blo[1]:bhi[1], blo[2]:bhi[2]]
+
+        # 先按均匀值整体展开，再覆盖混合砖块
+        expanded = np.repeat(np.repeat(np.repeat(sub_vals, b, 0), b, 1), b, 2)
+        o = lo - blo * b
+        out[...] = expanded[o[0]:o[0] + out.shape[0], o[1]:o[1] + out.shape[1], o[2]:o[2] + out.shape[2]]
+        for rel in np.argwhere(sub_dense):
+            bidx = tuple((rel + blo).tolist())
+            org = np.array(bidx) * b
+            s = np.maximum(lo, org)
+            e = np.minimum(hi, org + b)
+            out[s[0]-lo[0]:e[0]-lo[0], s[1]-lo[1]:e[1]-lo[1], s[2]-lo[2]:e[2]-lo[2]] = \
+                self.payload[bidx][s[0]-org[0]:e[0]-org[0], s[1]-org[1]:e[1]-org[1], s[2]-org[2]:e[2]-org[2]]
+        return out
+
+    def __getitem__(self, key):
+        box = self._box(key)
+        if box is None:
+            return np.asarray(self)[key]
+        lo, hi, squeeze = box
+        if len(squeeze) == 3:
+            bidx = tuple((lo // self.brick).tolist())
+            if not self.dense[bidx]:
+                return self.values[bidx]
+            return self.payload[bidx][tuple((lo % self.brick).tolist())]
+        out = self.read_box(lo, hi)
+        return out.squeeze(axis=squeeze) if squeeze else out
+
+    def __setitem__(self, key, value):
+        box = self._box(key)
+        if box is None or np.ndim(value) != 0:
+            raise TypeError("ChunkedGrid 只支持对盒区域 (步长为 1 的切片 / 整数下标) 赋标量值")
+        lo, hi, _ = box
+        self.fill_box(lo, hi, value)
+
+    # --- 扁平下标读写 (扫描 / 规划的体素列表) ---
+    def _split_flat(self, flat):
+        # 扁平下标 -> (砖块坐标, 砖块内坐标)，各为按轴拆开的三元组
+        x, rest = np.divmod(flat, self.shape[1] * self.shape[2])
+        y, z = np.divmod(rest, self.shape[2])
+        b = self.brick
+        return (x // b, y // b, z // b), (x % b, y % b, z % b)
+
+    def take(self, flat):
+        # 均匀砖块直接取单值，混合砖块从 pool 一次 gather
+        bidx, local = self._split_flat(np.asarray(flat, dtype=np.int64))
+        out = self.values[bidx]
+        slot = self.slot[bidx]
+        mixed = slot >= 0
+        if mixed.any():
+            out[mixed] = self.pool[(slot[mixed],) + tuple(v[mixed] for v in local)]
+        return out
+
+    def put(self, flat, value):
+        # 将扁平下标处的体素置为标量 value；值不同的均匀砖块先展开为混合砖块，
+        # 写入后整块变为均匀的砖块退回单值存储
+        flat = np.asarray(flat, dtype=np.int64)
+        if len(flat) == 0:
+            return
+        value = self.dtype.type(value)
+        bidx, local = self._split_flat(flat)
+        slot = self.slot[bidx]
+        todo = (slot >= 0) | (self.values[bidx] != value)
+        if not todo.any():
+            return
+        if not todo.all():
+            bidx, local, slot = (tuple(v[todo] for v in bidx), tuple(v[todo] for v in local), slot[todo])
+        if (slot < 0).any():
+            new = np.stack(bidx, axis=1)[slot < 0]
+            for b in np.unique(new, axis=0).tolist():
+                self._materialize(tuple(b))
+            slot = self.slot[bidx]
+        self.pool[(slot,) + local] = value
+
+        # 均匀性检查：完整位于网格内的砖块批量判断，边缘砖块逐个判断 (只看网格内部分)
+        touched, first = np.unique(slot, return_index=True)
+        tb = np.stack([v[first] for v in bidx], axis=1)
+        inner = np.all((tb + 1) * self.brick <= self.shape, axis=1)
+        uniform = (self.pool[touched[inner]] == value).all(axis=(1, 2, 3))
+        for b in tb[inner][uniform].tolist():
+            self._release(tuple(b))
+            self.values[tuple(b)] = value
+        for b in tb[~inner].tolist():
+            self._collapse(tuple(b))
+
+    # --- 稠密化 ---
+    def to_dense(self):
+        return self.read_box(np.zeros(3, dtype=int), np.array(self.shape))
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        return dense if dtype is None else dense.astype(dtype)
+
+    @classmethod
+    def from_dense(cls, grid, brick=16):
+        out = cls(grid.shape, brick, grid.dtype)
+        b = brick
+        pad = [(0, -n % b) for n in grid.shape]
+        padded = np.pad(grid, pad, mode='edge')
+        bx, by, bz = out.bshape
+        blocks = padded.reshape(bx, b, by, b, bz, b).transpose(0, 2, 4, 1, 3, 5)
+        first = blocks[..., 0, 0, 0]
+        uniform = (blocks == first[..., None, None, None]).all(axis=(3, 4, 5))
+        out.values[...] = first
+        out.dense[...] = ~uniform
+        out.pool = np.ascontiguousarray(blocks[~uniform])
+        out.slot[~uniform] = np.arange(len(out.pool))
+        out.payload = {bidx: out.pool[k] for k, bidx in enumerate(map(tuple, np.argwhere(~uniform).tolist()))}
+        return out
+
+
+if __name__ == "__main__":
+    VoxelEnvironment = importlib.import_module('3d_voxel').VoxelEnvironment
+    for res in [float(v) for v in sys.argv[1:]] or [0.5, 0.25, 0.1]:
+        t0 = time.perf_counter()
+        env = VoxelEnvironment(res=res, storage='chunked')
+        env.create_custom_scene()
+        build = time.perf_counter() - t0
+        g = env.grid
+        dense_bytes = g.size * g.dtype.itemsize
+        print(f"[分块存储] res={res} | 网格: {g.shape} | 砖块: {g.values.size} (混合 {len(g.payload)}) | "
+              f"内存: {g.nbytes / 2**20:.1f}MB / 稠密 {dense_bytes / 2**20:.1f}MB | 构建: {build:.3f}s")
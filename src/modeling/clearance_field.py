@@ -0,0 +1,256 @@
+import importlib
+import sys
+import time
+
+import numpy as np
+
+from line_of_sight import BLOCKING_MIN
+
+# 无障碍时的平方距离占位值 (远大于任何网格内可能的平方距离，且保留整数精度)
+FAR = 1e10
+
+
+def _edt_1d(f, axis):
+    # Felzenszwalb-Huttenlocher 一维平方距离变换：out[i] = min_j f[j] + (i - j)^2，线性时间
+    # 沿 axis 的所有行同时推进 (逐位置循环，行方向向量化)；数据排成 (n, 行数) 使每步访问连续
+    f = np.moveaxis(f, axis, 0)
+    shape = f.shape
+    n = shape[0]
+    f = np.ascontiguousarray(f).reshape(n, -1)
+    m = f.shape[1]
+    rows = np.arange(m)
+    flat = f.ravel()
+
+    # --- 1. 构建下包络 (抛物线顶点 v 与分界点 z)，只对需要弹出的行重复计算 ---
+    v = np.zeros(n * m, dtype=np.int64)
+    z = np.empty((n + 1) * m)
+    z[:m], z[m:2 * m] = -np.inf, np.inf
+    k = np.zeros(m, dtype=np.int64)
+    for q in range(1, n):
+        fq = f[q] + q * q
+        vk = v[k * m + rows]
+        s = (fq - (flat[vk * m + rows] + vk * vk)) / (2 * (q - vk))
+        idx = np.flatnonzero(s <= z[k * m + rows])
+        while len(idx):
+            k[idx] -= 1
+            vk = v[k[idx] * m + idx]
+            s[idx] = (fq[idx] - (flat[vk * m + idx] + vk * vk)) / (2 * (q - vk))
+            idx = idx[s[idx] <= z[k[idx] * m + idx]]
+        k += 1
+        v[k * m + rows] = q
+        z[k * m + rows] = s
+        z[(k + 1) * m + rows] = np.inf
+
+    # --- 2. 沿包络读出每个位置的最小值 ---
+    out = np.empty((n, m))
+    k[:] = 0
+    for q in range(n):
+        idx = np.flatnonzero(z[(k + 1) * m + rows] < q)
+        while len(idx):
+            k[idx] += 1
+            idx = idx[z[(k[idx] + 1) * m + idx] < q]
+        vk = v[k * m + rows]
+        out[q] = (q - vk) ** 2 + flat[vk * m + rows]
+    return np.moveaxis(out.reshape(shape), 0, axis)
+
+
+def _edt_first_axis(obstacle):
+    # 第一轴输入为二值障碍，一维距离用前后两次扫描即可得到 (同为线性时间，常数更小)
+    d = np.empty(obstacle.shape)
+    prev = np.full(obstacle.shape[1:], np.inf)
+    for i in range(len(d)):
+        prev = np.where(obstacle[i], 0.0, prev + 1)
+        d[i] = prev
+    prev[...] = np.inf
+    for i in range(len(d) - 1, -1, -1):
+        prev = np.where(obstacle[i], 0.0, prev + 1)
+        np.minimum(d[i], prev, out=d[i])
+    return np.where(np.isinf(d), FAR, d * d)
+
+
+def distance_transform(obstacle):
+    # 精确欧氏距离变换 (体素单位)：三轴依次做一维平方距离变换后开方
+    d2 = _edt_first_axis(obstacle)
+    for axis in (1, 2):
+        d2 = _edt_1d(d2, axis)
+    return np.sqrt(d2)
+
+
+class ClearanceField:
+    # 体素到最近障碍物 (状态 2~5，fog_blocking=True 时迷雾也计入) 的欧氏距离场
+    # 以 float16 体素单位存储并截断在 max_dist：截断使任意变化只影响其 max_dist 邻域，
+    # 增量更新只需在该邻域 (外扩 max_dist 以包含可能的最近障碍) 内重算距离变换
+
+    def __init__(self, grid, res, fog_blocking=False, max_dist=16, dtype=np.float16):
+        self.grid = grid
+        self.res = res
+        self.fog_blocking = fog_blocking
+        self.max_dist = max_dist
+        self.shape = np.array(grid.shape)
+        self.dist = np.empty(grid.shape, dtype=dtype)
+        self.rebuild()
+
+    def _obstacle(self, states):
+        blocked = states >= BLOCKING_MIN
+        return blocked | (states == 0) if self.fog_blocking else blocked
+
+    def rebuild(self):
+        t0 = time.perf_counter()
+        # 分块存储直接按砖块生成障碍掩码，不先展开稠密状态网格
+        if hasattr(self.grid, 'mask'):
+            obstacle = self.grid.mask(self._obstacle)
+        else:
+            obstacle = self._obstacle(np.asarray(self.grid))
+        self.dist[...] = np.minimum(distance_transform(obstacle), self.max_dist)
+        self.last_elapsed = time.perf_counter() - t0
+
+    # --- 增量更新 ---
+    def update_box(self, lo, hi):
+        # 体素盒 [lo, hi) 内状态变化后调用：距离改变的体素不超出盒外 max_dist 范围
+        t0 = time.perf_counter()
+        r = int(np.ceil(self.max_dist))
+        lo, hi = np.asarray(lo), np.asarray(hi)
+        if np.any(hi <= lo):
+            return
+        out_lo, out_hi = np.maximum(lo - r, 0), np.minimum(hi + r, self.shape)
+        win_lo, win_hi = np.maximum(out_lo - r, 0), np.minimum(out_hi + r, self.shape)
+        states = np.asarray(self.grid[win_lo[0]:win_hi[0], win_lo[1]:win_hi[1], win_lo[2]:win_hi[2]])
+        d = np.minimum(distance_transform(self._obstacle(states)), self.max_dist)
+        a, b = out_lo - win_lo, out_hi - win_lo
+        self.dist[out_lo[0]:out_hi[0], out_lo[1]:out_hi[1], out_lo[2]:out_hi[2]] = \
+            d[a[0]:b[0], a[1]:b[1], a[2]:b[2]]
+        self.last_elapsed = time.perf_counter() - t0
+
+    def update_cells(self, indices):
+        # 零散体素变化后调用 (如扫描揭示)，只处理障碍属性真正翻转的体素：
+        # 翻转体素按 2*max_dist 边长的瓦片聚成若干簇，每簇按自身包围盒重算；
+        # 各簇窗口总体积超过整张网格时直接整体重建
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return
+        t0 = time.perf_counter()
+        cells = np.stack(np.unravel_index(indices, tuple(self.shape)), axis=-1)
+        flipped = cells[self._obstacle(self.grid.take(indices)) != (self.dist[tuple(cells.T)] == 0)]
+        if len(flipped) == 0:
+            return
+        boxes = self._clusters(flipped)
+        r = 2 * int(np.ceil(self.max_dist))
+        work = sum(np.prod(np.minimum(hi + r, self.shape) - np.maximum(lo - r, 0)) for lo, hi in boxes)
+        if work >= np.prod(self.shape):
+            self.rebuild()
+        else:
+            for lo, hi in boxes:
+                self.update_box(lo, hi)
+        self.last_elapsed = time.perf_counter() - t0
+
+    def _clusters(self, cells):
+        # 按瓦片 26 邻接把体素聚簇，返回各簇的体素包围盒 [(lo, hi), ...]
+        tile = 2 * int(np.ceil(self.max_dist))
+        tiles = cells // tile
+        occupied, inverse = np.unique(tiles, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        index = {c: i for i, c in enumerate(map(tuple, occupied.tolist()))}
+        label = np.full(len(occupied), -1)
+        offsets = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+        n = 0
+        for i, c in enumerate(index):
+            if label[i] >= 0:
+                continue
+            label[i] = n
+            stack = [c]
+            while stack:
+                x, y, z = stack.pop()
+                for dx, dy, dz in offsets:
+                    j = index.get((x + dx, y + dy, z + dz))
+                    if j is not None and label[j] < 0:
+                        label[j] = n
+                        stack.append(occupied[j].tolist())
+            n += 1
+        group = label[inverse]
+        lo = np.full((n, 3), np.iinfo(np.int64).max)
+        hi = np.full((n, 3), -1)
+        np.minimum.at(lo, group, cells)
+        np.maximum.at(hi, group, cells)
+        return list(zip(lo, hi + 1))
+
+    # --- 查询 (世界坐标，米) ---
+    def _cells(self, xyz):
+        return np.clip((np.atleast_2d(xyz) / self.res).astype(np.int64), 0, self.shape - 1)
+
+    def clearance(self, xyz):
+        # (N, 3) 世界坐标 -> (N,) 到最近障碍物的距离 (米，截断在 max_dist * res)
+        return self.dist[tuple(self._cells(xyz).T)].astype(np.float64) * self.res
+
+    def fits(self, xyz, radius):
+        # 半径 radius (米) 的球形机体能否以这些点为中心
+        return self.clearance(xyz) >= radius
+
+    @property
+    def nbytes(self):
+        return self.dist.nbytes
+
+
+def check_edt(trials=20, seed=0):
+    # 校验：小随机网格上 distance_transform 与暴力求最近障碍的距离一致；返回最大绝对误差
+    rng = np.random.default_rng(seed)
+    worst = 0.0
+    for _ in range(trials):
+        shape = tuple(rng.integers(1, 12, 3).tolist())
+        obstacle = rng.random(shape) < rng.uniform(0.0, 0.3)
+        cells = np.argwhere(np.ones(shape, dtype=bool))
+        obs = np.argwhere(obstacle)
+        if len(obs):
+            d2 = ((cells[:, None, :] - obs[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+            expect = np.sqrt(d2).reshape(shape)
+        else:
+            expect = np.full(shape, np.sqrt(FAR))
+        err = float(np.max(np.abs(distance_transform(obstacle) - expect)))
+        assert err < 1e-9, (shape, err)
+        worst = max(worst, err)
+    return worst
+
+
+def check_incremental(env, rounds=6, seed=0):
+    # 校验：随机 add_block 与零散体素翻转后，增量维护的距离场须与整体重建逐体素一致
+    # (会修改 env.grid)；返回每轮 (变化体素数, 增量耗时, 重建耗时)
+    rng = np.random.default_rng(seed)
+    field = env.clearance_field
+    shape = np.array(env.grid.shape)
+    rows = []
+    for i in range(rounds):
+        before = np.asarray(env.grid).copy()
+        if i % 2 == 0:
+            lo = rng.integers(0, shape - 4) * env.res
+            env.add_block(lo, rng.uniform(0.5, 3.0, 3), state=int(rng.choice([1, 2])))
+            changed = np.flatnonzero(before != np.asarray(env.grid))
+        else:
+            # 散布在多个相距较远的簇中的零散翻转 (模拟一次扫描揭示多处)
+            centers = rng.integers(0, shape, (4, 3))
+            cells = np.clip(centers[:, None] + rng.integers(-3, 4, (4, 50, 3)), 0, shape - 1).reshape(-1, 3)
+            changed = np.unique(np.ravel_multi_index(tuple(cells.T), tuple(shape)))
+            env.grid.put(changed, 2 if i % 4 == 1 else 1)
+            env.notify_changed(changed)
+        elapsed = field.last_elapsed
+        ref = ClearanceField(env.grid, env.res, field.fog_blocking, field.max_dist)
+        assert np.array_equal(field.dist, ref.dist), i
+        rows.append((len(changed), elapsed, ref.last_elapsed))
+    return rows
+
+
+if __name__ == "__main__":
+    VoxelEnvironment = importlib.import_module('3d_voxel').VoxelEnvironment
+    env = VoxelEnvironment()
+    env.create_custom_scene()
+
+    if '--check' in sys.argv:
+        print(f"[校验] EDT 与暴力最近障碍距离最大误差: {check_edt():.2e}")
+        for i, (n, inc, full) in enumerate(check_incremental(env)):
+            print(f"[校验 {i}] 变化体素: {n} | 增量: {inc:.4f}s | 整体重建: {full:.4f}s")
+        sys.exit(0)
+
+    field = env.clearance_field
+    print(f"[间距场] 网格: {tuple(field.shape.tolist())} | 构建: {field.last_elapsed:.3f}s | "
+          f"内存: {field.nbytes / 2**20:.1f}MB ({field.dist.dtype})")
+    env.add_block([60, 40, 1], [2, 2, 3], state=2)
+    print(f"[增量更新] add_block 2x2x3m | 耗时: {field.last_elapsed:.3f}s")
+    print(f"[查询] 起点间距: {field.clearance(env.start)[0]:.2f}m | 终点间距: {field.clearance(env.goal)[0]:.2f}m")
@@ -0,0 +1,183 @@
+import importlib
+import time
+
+import numpy as np
+
+from profiling import PROFILER, timed
+
+# 遮挡状态：2 内墙, 3 外围墙, 4 地板/天花板, 5 楼梯
+OCCLUDER_MIN = 2
+FOG, FREE = 0, 1
+
+
+def cone_directions(fov_deg, angular_step):
+    # 以 +X 为轴、半角 fov/2 的锥内单位方向模板 (球冠上的 Fibonacci 螺旋，近似均匀)
+    half = np.radians(fov_deg) / 2.0
+    cap = 2.0 * np.pi * (1.0 - np.cos(half))
+    n = max(int(np.ceil(cap / angular_step ** 2)), 1)
+    i = np.arange(n) + 0.5
+    cos_t = 1.0 - (1.0 - np.cos(half)) * i / n
+    sin_t = np.sqrt(1.0 - cos_t ** 2)
+    phi = i * np.pi * (3.0 - np.sqrt(5.0))
+    return np.stack([cos_t, sin_t * np.cos(phi), sin_t * np.sin(phi)], axis=1)
+
+
+def pose_rotations(yaw, pitch):
+    # 航向 (绕 Z) 与俯仰 (绕 Y, 抬头为正) 组合的旋转矩阵，形状 (P, 3, 3)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    zero = np.zeros_like(yaw)
+    return np.stack([
+        np.stack([cy * cp, -sy, -cy * sp], axis=-1),
+        np.stack([sy * cp, cy, -sy * sp], axis=-1),
+        np.stack([sp, zero, cp], axis=-1),
+    ], axis=1)
+
+
+class SectorScanner:
+    # 动态信息场 (DIF) 扇形锥扫描：一次调用处理一批位姿，所有射线同步做体素遍历
+
+    def __init__(self, res, fov=110.0, max_range=30.0, oversample=1.0, max_rays=50_000):
+        self.res = res
+        self.fov = fov
+        self.max_range = max_range
+        # 相邻射线在最远处的间距不超过 res / oversample，保证远端体素不被漏扫
+        self.templates = cone_directions(fov, res / (max_range * oversample))
+        self.max_rays = max_rays
+
+        self.last_rays = 0
+        self.last_steps = 0
+        self.last_elapsed = 0.0
+
+    @timed('scan.update')
+    def scan(self, env, poses):
+        # poses: (P, 4) 或 (P, 5) 数组 [x, y, z, yaw(度), pitch(度, 可选)]，单个位姿也可
+        # 原地揭示 env.grid 中可见的迷雾体素 (0 -> 1)，返回发生变化的扁平下标 (升序、去重)
+        # env 启用暴露场时，本次看到的全部非遮挡体素在当前时刻累加暴露值
+        t0 = time.perf_counter()
+        poses = np.atleast_2d(np.asarray(poses, dtype=np.float64))
+        if poses.shape[1] == 4:
+            poses = np.column_stack([poses, np.zeros(len(poses))])
+
+        # 按射线总数分块，控制单次遍历的内存
+        chunk = max(self.max_rays // len(self.templates), 1)
+        visible = []
+        seen = [] if env.exposure is not None else None
+        self.last_rays = self.last_steps = 0
+        for i in range(0, len(poses), chunk):
+            visible.append(self._trace(env.grid, poses[i:i + chunk], seen))
+
+        changed = np.unique(np.concatenate(visible))
+        env.notify_changed(changed)
+        PROFILER.count('scan.rays', self.last_rays)
+        PROFILER.count('scan.steps', self.last_steps)
+        if seen:
+            env.exposure.deposit(np.concatenate(seen))
+        self.last_elapsed = time.perf_counter() - t0
+        return changed
+
+    def _trace(self, grid, poses, seen=None):
+        # 向量化 Amanatides-Woo：每次迭代让所有存活射线同时前进一个体素
+        rot = pose_rotations(np.radians(poses[:, 3]), np.radians(poses[:, 4]))
+        dirs = np.einsum('pij,rj->pri', rot, self.templates).reshape(-1, 3)
+        origin = np.repeat(poses[:, :3] / self.res, len(self.templates), axis=0)
+        shape = np.array(grid.shape)
+        strides = np.array([shape[1] * shape[2], shape[2], 1])
+
+        cell = np.floor(origin).astype(np.int64)
+        step = np.sign(dirs).astype(np.int64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv = np.where(dirs != 0, 1.0 / dirs, np.inf)
+            t_delta = np.abs(inv).ravel()
+            t_max = np.where(dirs != 0, (cell + (step > 0) - origin) * inv, np.inf)
+        step3, step = step, step.ravel()
+        limit = self.max_range / self.res
+        ray = np.arange(len(dirs))
+        # 分块存储：处于均匀空闲砖块内的射线整块跳到出口体素 (沿途无迷雾可揭示、无遮挡)，
+        # 均匀遮挡砖块由 take 直接给出单值，射线第一步即终止。需要累计暴露时逐体素前进
+        skip = seen is None and hasattr(grid, 'slot')
+
+        visible = []
+        self.last_rays += len(dirs)
+        while len(ray):
+            self.last_steps += 1
+            inside = np.all((cell >= 0) & (cell < shape), axis=1)
+            if not inside.all():
+                ray, cell, t_max = ray[inside], cell[inside], t_max[inside]
+            idx = cell @ strides
+            state = grid.take(idx)  # 稠密数组与分块存储均支持扁平下标读写
+
+            # 迷雾体素可见 -> 立即揭示并记录 (迷雾不遮挡，提前写回不影响其它射线，
+            # 且后续射线不会重复记录同一体素)；遇到遮挡体素 -> 射线终止
+            hit = idx[state == FOG]
+            if len(hit):
+                grid.put(hit, FREE)
+                visible.append(hit)
+            alive = state < OCCLUDER_MIN
+            if seen is not None:
+                seen.append(idx[alive])
+
+            # 沿 t_max 最小的轴跨入下一个体素，超出量程的射线终止
+            axis = np.argmin(t_max, axis=1)
+            alive &= t_max.ravel()[np.arange(len(axis)) * 3 + axis] <= limit
+            if not alive.all():
+                ray, cell, t_max, axis = ray[alive], cell[alive], t_max[alive], axis[alive]
+            jump = None
+            free_bricks = (grid.values == FREE) & ~grid.dense if skip else None
+            if skip and len(ray) and free_bricks.any():
+                jump = free_bricks[tuple((cell // grid.brick).T)]
+                if jump.any():
+                    ray, cell, t_max, axis, jump = self._skip_bricks(
+                        grid.brick, origin, dirs, inv, step3, limit, ray, cell, t_max, axis, jump)
+                else:
+                    jump = None
+            slot = np.arange(len(axis)) * 3 + axis
+            src = ray * 3 + axis
+            if jump is not None:
+                slot, src = slot[~jump], src[~jump]
+            cell.ravel()[slot] += step[src]
+            t_max.ravel()[slot] += t_delta[src]
+
+        return np.concatenate(visible) if visible else np.empty(0, dtype=np.int64)
+
+    @staticmethod
+    def _skip_bricks(brick, origin, dirs, inv, step, limit, ray, cell, t_max, axis, jump):
+        # jump 标记的射线直接移到离开当前砖块后的第一个体素并重算 t_max；
+        # 出口超出量程的射线终止。返回过滤后的状态与 (对齐后的) jump 掩码
+        r = ray[jump]
+        o, st = origin[r], step[r]
+        lo = cell[jump] // brick * brick
+        edge = np.where(st > 0, lo + brick - 1, lo)
+        with np.errstate(invalid='ignore'):
+            t_edge = np.where(st != 0, (edge + (st > 0) - o) * inv[r], np.inf)
+        a = np.argmin(t_edge, axis=1)
+        rows = np.arange(len(r))
+        t_exit = t_edge[rows, a]
+        new = np.clip(np.floor(o + t_exit[:, None] * dirs[r]).astype(np.int64), lo, lo + brick - 1)
+        new[rows, a] = edge[rows, a] + st[rows, a]
+        cell[jump] = new
+        with np.errstate(invalid='ignore'):
+            t_max[jump] = np.where(st != 0, (new + (st > 0) - o) * inv[r], np.inf)
+
+        keep = np.ones(len(ray), dtype=bool)
+        keep[np.flatnonzero(jump)[t_exit > limit]] = False
+        if not keep.all():
+            ray, cell, t_max, axis, jump = ray[keep], cell[keep], t_max[keep], axis[keep], jump[keep]
+        return ray, cell, t_max, axis, jump
+
+
+if __name__ == "__main__":
+    VoxelEnvironment = importlib.import_module('3d_voxel').VoxelEnvironment
+    env = VoxelEnvironment()
+    env.create_custom_scene()
+
+    # 沿西楼一层走廊向东的一段轨迹，每 2m 扫描一次
+    xs = np.arange(16.0, 60.0, 2.0)
+    trajectory = np.column_stack([xs, np.full_like(xs, 45.0), np.full_like(xs, 1.8), np.zeros_like(xs)])
+
+    scanner = SectorScanner(env.res)
+    changed = scanner.scan(env, trajectory[:1])
+    print(f"[单帧] 射线: {scanner.last_rays} | 揭示体素: {len(changed)} | 耗时: {scanner.last_elapsed:.4f}s")
+    changed = scanner.scan(env, trajectory[1:])
+    print(f"[轨迹 {len(trajectory) - 1} 帧] 射线: {scanner.last_rays} | 揭示体素: {len(changed)} | "
+          f"耗时: {scanner.last_elapsed:.4f}s")
@@ -0,0 +1,427 @@
+import heapq
+import importlib
+import math
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from line_of_sight import segments_clear
+from profiling import PROFILER, timed
+
+# 26 邻域偏移表 (dx, dy, dz) 及其欧氏步长 (体素单位)
+NEIGHBOR_OFFSETS = np.array([(dx, dy, dz)
+                             for dx in (-1, 0, 1)
+                             for dy in (-1, 0, 1)
+                             for dz in (-1, 0, 1)
+                             if (dx, dy, dz) != (0, 0, 0)])
+NEIGHBOR_COSTS = np.linalg.norm(NEIGHBOR_OFFSETS, axis=1)
+
+# 防穿角：对角移动要求其所有轴向分量子步也可通行
+# CORNER_BLOCKS[k, j] = 1 表示邻居 k 依赖邻居 j 可通行
+CORNER_BLOCKS = np.array([[np.all((b == 0) | (b == a)) and not np.array_equal(a, b)
+                           for b in NEIGHBOR_OFFSETS] for a in NEIGHBOR_OFFSETS], dtype=np.int8)
+
+SQRT2_1 = math.sqrt(2) - 1
+SQRT3_2 = math.sqrt(3) - math.sqrt(2)
+# 按升序排列的 (|d| 最小, 中, 最大) 分量权重
+OCTILE_WEIGHTS = np.array([SQRT3_2, SQRT2_1, 1.0])
+
+# 默认可通行状态：0 迷雾 (乐观假设) 与 1 自由空间
+PASSABLE_STATES = (0, 1)
+
+
+@dataclass
+class PlanResult:
+    path: np.ndarray            # (N, 3) 世界坐标 (体素中心)，无解时为空
+    cost: float                 # 路径长度 (米)，无解时为 inf
+    expanded: int               # 扩展节点数
+    elapsed: float              # 单次查询耗时 (秒)
+    cells: np.ndarray = field(default=None, repr=False)  # (N, 3) 体素下标
+
+    @property
+    def found(self):
+        return len(self.path) > 0
+
+
+def free_components(free, strides):
+    # 可通行体素的 6 连通分量 (防穿角规则下对角移动必经轴向子步，故 6 连通 = 规划可达)
+    # free 为带哨兵外圈的扁平布尔数组。先把最内轴上的连续可通行体素合并为"段"，
+    # 再按相邻段的重叠关系做向量化并查集 (挂接 + 指针跳跃)，不需要逐体素标号
+    # 返回 (各段起点扁平下标, 各段分量标号)
+    starts = free.copy()
+    starts[1:] &= ~free[:-1]
+    run_start = np.flatnonzero(starts)
+    run = np.cumsum(starts, dtype=np.int32) - 1
+    us, vs = [], []
+    for st in (int(strides[0]), int(strides[1])):
+        both = free[:-st] & free[st:]
+        # 同一对段只在重叠区间的第一个体素处记一次
+        first = both.copy()
+        first[1:] &= ~both[:-1]
+        i = np.flatnonzero(first)
+        us.append(run[i])
+        vs.append(run[i + st])
+    del run
+    u, v = np.concatenate(us), np.concatenate(vs)
+
+    label = np.arange(len(run_start), dtype=np.int32)
+    while len(u):
+        lu, lv = label[u], label[v]
+        diff = lu != lv
+        u, v, lu, lv = u[diff], v[diff], lu[diff], lv[diff]
+        if not len(u):
+            break
+        # 挂接：较大的根指向较小的根 (父节点标号严格更小，不会成环)
+        np.minimum.at(label, np.maximum(lu, lv), np.minimum(lu, lv))
+        while True:
+            nxt = label[label]
+            if np.array_equal(nxt, label):
+                break
+            label = nxt
+    return run_start, label
+
+
+class BucketQueue:
+    # 分桶批量优先队列：键按宽度 width 分桶，每个堆条目是同一桶内的一批节点及其入堆时的 g
+    # (tie 序号避免比较数组)；一次出堆整桶。批量 A* (GridPlanner / NavGraph) 与 D* Lite 共用
+
+    def __init__(self, width=1.0):
+        self.width = width
+        self.heap = []
+        self._tie = 0
+
+    def __bool__(self):
+        return bool(self.heap)
+
+    def lower_bound(self):
+        # 队列中全部键的下界 (堆顶桶的起点)，空队列为 inf
+        return self.heap[0][0] * self.width if self.heap else math.inf
+
+    def push(self, nodes, keys, g):
+        buckets = (keys // self.width).astype(np.int64)
+        if buckets.min() == buckets.max():
+            self._tie += 1
+            heapq.heappush(self.heap, (int(buckets[0]), self._tie, nodes, g))
+            return
+        order = np.argsort(buckets, kind='stable')
+        buckets, nodes, g = buckets[order], nodes[order], g[order]
+        cut = np.flatnonzero(buckets[1:] != buckets[:-1]) + 1
+        for b, vv, gg in zip(buckets[np.r_[0, cut]].tolist(), np.split(nodes, cut), np.split(g, cut)):
+            self._tie += 1
+            heapq.heappush(self.heap, (b, self._tie, vv, gg))
+
+    def pop_bucket(self):
+        # 弹出堆顶桶的全部条目，返回 (桶号, 节点, 入堆时的 g)，节点可能重复
+        bucket = self.heap[0][0]
+        nodes, gs = [], []
+        while self.heap and self.heap[0][0] == bucket:
+            _, _, n, gn = heapq.heappop(self.heap)
+            nodes.append(n)
+            gs.append(gn)
+        return bucket, np.concatenate(nodes), np.concatenate(gs)
+
+    def pop(self, g):
+        # 弹出堆顶桶；惰性删除入堆后 g 已被改进的条目，返回去重后的节点
+        _, u, gu = self.pop_bucket()
+        return np.unique(u[gu <= g[u]])
+
+
+class GridIndex:
+    # 体素规划器的公共部分：可通行掩码、节点下标映射、起终点吸附与批量邻居展开，
+    # 与搜索算法无关；GridPlanner (A* / Theta*) 与 IncrementalPlanner (D* Lite) 各自持有搜索缓冲区
+
+    def __init__(self, grid, res, passable=PASSABLE_STATES):
+        self.res = res
+        self.grid_shape = np.array(grid.shape)
+
+        # 外围补一圈不可通行哨兵，邻居下标永远不会越界或跨行回绕
+        # 分块存储 (ChunkedGrid) 按砖块判断可通行性，均匀砖块整块跳过逐体素比较
+        mask = grid.isin(passable) if hasattr(grid, 'isin') else np.isin(grid, passable)
+        padded = np.pad(mask, 1, constant_values=False)
+        self.shape = np.array(padded.shape)
+        self.strides = np.array([self.shape[1] * self.shape[2], self.shape[2], 1])
+        self.free = padded.ravel()
+        self.origin = int(self.strides.sum())  # 体素 (0, 0, 0) 的扁平下标
+
+        # 以扁平下标表示节点，邻居 = 当前下标 + 偏移
+        self.offsets = NEIGHBOR_OFFSETS @ self.strides
+        self.step_costs = NEIGHBOR_COSTS
+
+    # --- 坐标转换 ---
+    def world_to_cell(self, xyz):
+        return (np.asarray(xyz) / self.res).astype(int)
+
+    def cell_to_node(self, cell):
+        return int(np.asarray(cell) @ self.strides) + self.origin
+
+    def node_to_cell(self, node):
+        node = np.asarray(node)
+        return np.stack(np.unravel_index(node, self.shape), axis=-1) - 1
+
+    def is_free(self, cell):
+        cell = np.asarray(cell)
+        if np.any(cell < 0) or np.any(cell >= self.grid_shape):
+            return False
+        return bool(self.free[self.cell_to_node(cell)])
+
+    def snap_to_free(self, cell, max_radius=8):
+        # 起终点落在墙体内时 (如默认起点)，吸附到半径内最近的可通行体素
+        cell = np.clip(np.asarray(cell), 0, self.grid_shape - 1)
+        if self.is_free(cell):
+            return cell
+        lo = np.maximum(cell - max_radius, 0)
+        hi = np.minimum(cell + max_radius + 1, self.grid_shape)
+        window = self.free.reshape(self.shape)[lo[0]+1:hi[0]+1, lo[1]+1:hi[1]+1, lo[2]+1:hi[2]+1]
+        cand = np.argwhere(window) + lo
+        if len(cand) == 0:
+            return None
+        return cand[np.argmin(np.sum((cand - cell) ** 2, axis=1))]
+
+    def _expand(self, u):
+        # 一批节点的 26 邻居 (B, 26) 及其可达掩码 (已做防穿角过滤)
+        nb = u[:, None] + self.offsets
+        ok = self.free[nb]
+        ok &= (~ok).view(np.int8) @ CORNER_BLOCKS.T == 0
+        return nb, ok
+
+
+class GridPlanner(GridIndex):
+    def __init__(self, grid, res, passable=PASSABLE_STATES, pyramid=None):
+        super().__init__(grid, res, passable)
+        self.pyramid = pyramid  # 占据金字塔 (可选)，粗到细搜索时使用
+
+        # 数组化的 g 值 / 父节点 / 关闭标记，用查询编号做时间戳，免去每次查询清零
+        n = self.free.size
+        self.g = np.empty(n, dtype=np.float64)
+        self.parent = np.empty(n, dtype=np.int32 if n < 2 ** 31 else np.int64)
+        self.seen = np.zeros(n, dtype=np.int32)
+        self.closed = np.zeros(n, dtype=np.int32)
+        self.query_id = 0
+        # 批量 A* 的 f 分桶宽度 (体素单位)：越宽出堆次数越少，但终止前多扩展的节点越多
+        self.bucket = 1.0
+        # 连通分量 (首次查询时按当前 free 计算；外部修改 free 后需置为 None)
+        self.components = None
+
+    @property
+    def nbytes(self):
+        # 搜索缓冲区与可通行掩码 (每体素约 21 字节)，不含共享的网格与金字塔
+        return self.free.nbytes + self.g.nbytes + self.parent.nbytes + self.seen.nbytes + self.closed.nbytes
+
+    @classmethod
+    def from_env(cls, env, passable=PASSABLE_STATES, radius=0.0):
+        # radius > 0 时按间距场剔除半径 radius (米) 的机体无法通过的体素
+        planner = cls(env.grid, env.res, passable, env.pyramid)
+        if radius > 0:
+            fits = env.clearance_field.dist >= radius / env.res
+            planner.free &= np.pad(fits, 1, constant_values=False).ravel()
+        return planner
+
+    def reachable(self, s, t):
+        # s, t 为扁平节点下标 (均可通行)；不连通时任何搜索都无解，查询前直接判定
+        if self.components is None:
+            self.components = free_components(self.free, self.strides)
+        run_start, label = self.components
+        i, j = np.searchsorted(run_start, [s, t], side='right') - 1
+        return label[i] == label[j]
+
+    # --- 视线检测 (体素坐标系) ---
+    def line_of_sight(self, a, b):
+        # a, b 为 (N, 3) 体素下标，批量 DDA 视线检测 (保守处理穿棱 / 穿角)，返回 (N,) 布尔
+        return segments_clear(self.free, self.strides, a, b, self.origin)
+
+    # --- 查询 ---
+    @timed('plan.query')
+    def plan(self, start, goal, method='theta', coarse_level=None, margin=1):
+        # start / goal 为世界坐标；method: 'astar' 或 'theta' (Lazy Theta*)
+        # coarse_level: 先在金字塔第 k 层 (2^k 倍，1 <= k <= pyramid.levels) 上找走廊，再只在走廊 (外扩 margin 块) 内细化
+        t0 = time.perf_counter()
+        s_cell = self.snap_to_free(self.world_to_cell(start))
+        g_cell = self.snap_to_free(self.world_to_cell(goal))
+        if s_cell is None or g_cell is None:
+            return PlanResult(np.empty((0, 3)), np.inf, 0, time.perf_counter() - t0, np.empty((0, 3), int))
+
+        s, t = self.cell_to_node(s_cell), self.cell_to_node(g_cell)
+        if not self.reachable(s, t):
+            return PlanResult(np.empty((0, 3)), np.inf, 0, time.perf_counter() - t0, np.empty((0, 3), int))
+        if coarse_level is None:
+            expanded = self._search(s, t, method)
+        else:
+            expanded = self._search_corridor(s_cell, g_cell, method, coarse_level, margin)
+
+        if self.closed[t] != self.query_id:
+            return PlanResult(np.empty((0, 3)), np.inf, expanded, time.perf_counter() - t0, np.empty((0, 3), int))
+
+        nodes = [t]
+        while nodes[-1] != s:
+            nodes.append(int(self.parent[nodes[-1]]))
+        cells = self.node_to_cell(np.array(nodes[::-1]))
+        path = cells * self.res + self.res / 2.0
+        cost = float(self.g[t]) * self.res
+        return PlanResult(path, cost, expanded, time.perf_counter() - t0, cells)
+
+    def _search(self, s, t, method):
+        if method == 'astar':
+            expanded = self._astar(s, t)
+        elif method == 'theta':
+            expanded = self._lazy_theta(s, t)
+        else:
+            raise ValueError(f"未知的规划方法: {method}")
+        PROFILER.count('plan.expanded', expanded)
+        return expanded
+
+    def _search_corridor(self, s_cell, g_cell, method, level, margin):
+        # 粗到细：粗层以"非全实体块"为可通行 (乐观) 跑 A* 得到连续的块序列作为走廊，
+        # 细层只在走廊内搜索；走廊内无解 (粗层乐观假设不成立) 时退回全图搜索。
+        # 细层任一可行路径经过的块都不是全实体块，故粗层无解即细层无解，直接返回
+        if self.pyramid is None:
+            raise ValueError("粗到细搜索需要占据金字塔 (请使用 GridPlanner.from_env 构建)")
+        if not 1 <= level <= self.pyramid.levels:
+            raise ValueError(f"coarse_level 须在 1~{self.pyramid.levels} 之间: {level}")
+        f = 2 ** level
+        coarse = GridPlanner(~self.pyramid.summary(level)[1], self.res * f, passable=(True,))
+        r = coarse.plan((s_cell + 0.5) * self.res, (g_cell + 0.5) * self.res, method='astar')
+        s, t = self.cell_to_node(s_cell), self.cell_to_node(g_cell)
+        if not r.found:
+            self.query_id += 1    # 使 closed[t] 不属于本次查询，plan 据此返回未找到
+            return r.expanded
+
+        corridor = np.zeros(coarse.grid_shape, dtype=bool)
+        corridor[tuple(np.vstack([r.cells, s_cell // f, g_cell // f]).T)] = True
+        for _ in range(margin):
+            p = np.pad(corridor, 1)
+            x, y, z = corridor.shape
+            corridor = np.logical_or.reduce([p[1+dx:1+dx+x, 1+dy:1+dy+y, 1+dz:1+dz+z]
+                                             for dx, dy, dz in np.vstack([NEIGHBOR_OFFSETS, [0, 0, 0]])])
+        fine = np.repeat(np.repeat(np.repeat(corridor, f, 0), f, 1), f, 2)
+        gx, gy, gz = self.grid_shape
+        mask = np.pad(fine[:gx, :gy, :gz], 1, constant_values=False).ravel()
+
+        full = self.free
+        self.free = full & mask
+        try:
+            expanded = self._search(s, t, method)
+        finally:
+            self.free = full
+        if self.closed[t] != self.query_id:
+            expanded += self._search(s, t, method)
+        return r.expanded + expanded
+
+    def _begin(self, s, t, euclid):
+        # 新查询：起点入堆 (堆条目为 f 桶内的一批节点，见 _astar)
+        self.query_id += 1
+        self.g[s] = 0.0
+        self.parent[s] = s
+        self.seen[s] = self.query_id
+        self.goal_cell = self.node_to_cell(t)
+        heap = BucketQueue(self.bucket)
+        s = np.array([s])
+        heap.push(s, self._heuristics(s, euclid), np.zeros(1))
+        return heap
+
+    def _heuristics(self, nodes, euclid=False):
+        # 到终点的启发值，nodes 为扁平节点下标数组：A* 使用 26 邻域一致的 octile 距离，
+        # Theta* 的任意角路径可能更短，使用欧氏距离 (euclid=True)
+        d = np.abs(self.node_to_cell(nodes) - self.goal_cell)
+        if euclid:
+            return np.sqrt(np.sum(d * d, axis=1))
+        d.sort(axis=1)
+        return d @ OCTILE_WEIGHTS
+
+    # --- 分桶批量扩展 ---
+    def _relax(self, heap, nb, ok, tent, parent, euclid=False):
+        # 松弛 ok 所选的邻居：同一邻居被多个节点松弛时取最小 g，只保留比已知 g 更优的，更新后入堆
+        # 返回被更新的节点
+        qid = self.query_id
+        ok &= (self.seen[nb] != qid) | (tent < self.g[nb])
+        v, tv, pv = nb[ok], tent[ok], parent[ok]
+        order = np.lexsort((tv, v))
+        v, tv, pv = v[order], tv[order], pv[order]
+        first = np.ones(len(v), dtype=bool)
+        first[1:] = v[1:] != v[:-1]
+        v, tv, pv = v[first], tv[first], pv[first]
+        self.g[v] = tv
+        self.parent[v] = pv
+        self.seen[v] = qid
+        if len(v):
+            heap.push(v, tv + self._heuristics(v, euclid), tv)
+        return v
+
+    def _astar(self, s, t):
+        # 分桶批量扩展：堆中每个条目是 f 落在同一桶 (宽 bucket 体素) 内的一批节点，
+        # 一次出堆整桶，邻居过滤 / 松弛 / 启发值全部按数组计算，Python 循环次数与桶数而非节点数成正比。
+        # 同桶节点可能互相改进 g，已关闭节点 g 变小时重新打开 (标号修正)；
+        # 堆顶桶的 f 下界不小于 g(t) 时终止，结果与逐节点 A* 同为最优
+        heap = self._begin(s, t, euclid=False)
+        qid, closed, seen, g = self.query_id, self.closed, self.seen, self.g
+        expanded = 0
+        while heap:
+            if seen[t] == qid and heap.lower_bound() >= g[t]:
+                break
+            u = heap.pop(g)
+            u = u[closed[u] != qid]
+            if not len(u):
+                continue
+            closed[u] = qid
+            expanded += len(u)
+            nb, ok = self._expand(u)
+            tent = g[u][:, None] + self.step_costs
+            closed[self._relax(heap, nb, ok, tent, np.broadcast_to(u[:, None], nb.shape))] = 0
+        if seen[t] == qid:
+            closed[t] = qid
+        return expanded
+
+    def _lazy_theta(self, s, t):
+        # 与 _astar 相同的分桶批量扩展；已关闭节点不再打开，终点出堆即结束
+        heap = self._begin(s, t, euclid=True)
+        qid, closed, g, parent = self.query_id, self.closed, self.g, self.parent
+        expanded = 0
+        while heap and closed[t] != qid:
+            u = heap.pop(g)
+            u = u[closed[u] != qid]
+            if not len(u):
+                continue
+
+            # Lazy Theta*：出堆时才验证 parent(u) -> u 的视线 (整桶一次批量 DDA)，
+            # 失败则退回最优已关闭邻居 (生成 u 的节点必在其中)
+            p = parent[u]
+            check = np.flatnonzero(p != u)
+            if len(check):
+                vis = self.line_of_sight(self.node_to_cell(p[check]), self.node_to_cell(u[check]))
+                bad = u[check[~vis]]
+                if len(bad):
+                    nb, ok = self._expand(bad)
+                    cand = np.where(ok & (closed[nb] == qid), g[nb] + self.step_costs, np.inf)
+                    j = np.argmin(cand, axis=1)
+                    rows = np.arange(len(bad))
+                    parent[bad] = nb[rows, j]
+                    g[bad] = cand[rows, j]
+                    p = parent[u]
+
+            closed[u] = qid
+            expanded += len(u)
+
+            # 邻居直接挂到 parent(u) 上 (路径 2)，代价为欧氏距离
+            nb, ok = self._expand(u)
+            ok &= closed[nb] != qid
+            d = self.node_to_cell(u)[:, None] + NEIGHBOR_OFFSETS - self.node_to_cell(p)[:, None]
+            tent = g[p][:, None] + np.sqrt(np.sum(d * d, axis=2))
+            self._relax(heap, nb, ok, tent, np.broadcast_to(p[:, None], nb.shape), euclid=True)
+        return expanded
+
+
+def plan_path(env, method='theta'):
+    # 在环境默认起终点之间规划
+    return GridPlanner.from_env(env).plan(env.start, env.goal, method=method)
+
+
+if __name__ == "__main__":
+    VoxelEnvironment = importlib.import_module('3d_voxel').VoxelEnvironment
+    env = VoxelEnvironment()
+    env.create_custom_scene()
+
+    planner = GridPlanner.from_env(env)
+    for method, level in (('astar', None), ('theta', None), ('astar', 1), ('theta', 1)):
+        r = planner.plan(env.start, env.goal, method=method, coarse_level=level)
+        tag = method if level is None else f"{method} 粗到细 {2 ** level}x"
+        print(f"[{tag}] 路径点: {len(r.path)} | 长度: {r.cost:.2f}m | 扩展节点: {r.expanded} | 耗时: {r.elapsed:.4f}s")
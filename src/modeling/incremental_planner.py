@@ -0,0 +1,258 @@
+import importlib
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from grid_planner import OCTILE_WEIGHTS, PASSABLE_STATES, BucketQueue, GridIndex, GridPlanner, PlanResult
+
+
+@dataclass
+class UpdateStats:
+    changed: int = 0        # 本次传入的状态变化体素数
+    flipped: int = 0        # 其中可通行性真正发生翻转的体素数
+    expanded: int = 0       # 修复过程中 (重新) 扩展的节点数
+    elapsed: float = 0.0    # 更新 + 修复耗时 (秒)
+
+
+class IncrementalPlanner(GridIndex):
+    # D* Lite：从终点反向搜索，起点随移动改变，地图变化时只修复受影响的部分
+    # 与 GridPlanner._astar 相同的分桶批量处理：一次出堆 k1 落在同一桶内的全部不一致节点，
+    # 邻居展开 / rhs 计算 / 前驱传播按数组完成；同桶内处理顺序不严格时由后续出堆修正 (标号修正)
+    # 注意：本规划器直接引用 grid (不复制)，扫描修改 grid 后通过 update() 通知变化体素
+
+    def __init__(self, grid, res, goal, passable=PASSABLE_STATES):
+        super().__init__(grid, res, passable)
+        self.grid = grid
+        self.passable = np.array(passable)
+
+        n = self.free.size
+        self.g = np.full(n, np.inf)
+        self.rhs = np.full(n, np.inf)
+        self.open_list = BucketQueue(1.0)
+        self.km = 0.0
+
+        g_cell = self.snap_to_free(self.world_to_cell(goal))
+        if g_cell is None:
+            raise ValueError("终点附近没有可通行体素")
+        self.goal_node = self.cell_to_node(g_cell)
+        self.start_node = None
+        self.start_cell = None
+        self.rhs[self.goal_node] = 0.0
+        self._push(np.array([self.goal_node]))
+
+        self.total_expanded = 0
+        self.last_update = UpdateStats()
+
+    @classmethod
+    def from_env(cls, env, passable=PASSABLE_STATES):
+        return cls(env.grid, env.res, env.goal, passable)
+
+    @property
+    def nbytes(self):
+        return self.free.nbytes + self.g.nbytes + self.rhs.nbytes
+
+    # --- D* Lite 基本操作 (批量) ---
+    def _h(self, nodes):
+        # 到当前起点的 octile 距离 (反向搜索，26 邻域一致)；起点未定时为 0
+        if self.start_cell is None:
+            return np.zeros(len(nodes))
+        d = np.abs(self.node_to_cell(nodes) - self.start_cell)
+        d.sort(axis=1)
+        return d @ OCTILE_WEIGHTS
+
+    def _k1(self, nodes):
+        return np.minimum(self.g[nodes], self.rhs[nodes]) + self._h(nodes) + self.km
+
+    def _push(self, nodes):
+        if len(nodes):
+            k1 = self._k1(nodes)
+            self.open_list.push(nodes, k1, k1)
+
+    def _update_vertices(self, nodes):
+        # rhs(u) = min_v c(u, v) + g(v) (终点固定为 0，不可通行为 inf)，不一致的入堆
+        inner = nodes[nodes != self.goal_node]
+        nb, ok = self._expand(inner)
+        best = np.where(ok, self.g[nb] + self.step_costs, np.inf).min(axis=1, initial=np.inf)
+        self.rhs[inner] = np.where(self.free[inner], best, np.inf)
+        self._push(nodes[self.g[nodes] != self.rhs[nodes]])
+
+    def _lower(self, u):
+        # 过一致：g 下降为 rhs，向前驱传播 rhs = min(rhs, c + g(u))；多个节点松弛同一前驱时取最小
+        g, rhs = self.g, self.rhs
+        g[u] = rhs[u]
+        nb, ok = self._expand(u)
+        cand = g[u][:, None] + self.step_costs
+        ok &= (cand < rhs[nb]) & (nb != self.goal_node)
+        v, c = nb[ok], cand[ok]
+        order = np.lexsort((c, v))
+        v, c = v[order], c[order]
+        first = np.ones(len(v), dtype=bool)
+        first[1:] = v[1:] != v[:-1]
+        v = v[first]
+        rhs[v] = c[first]
+        self._push(v[g[v] != rhs[v]])
+
+    def _raise(self, u):
+        # 欠一致：g 置为无穷，重新计算自身与 rhs 依赖它的前驱
+        g_old = self.g[u]
+        self.g[u] = np.inf
+        nb, ok = self._expand(u)
+        ok &= self.free[u][:, None] & (self.rhs[nb] == g_old[:, None] + self.step_costs)
+        self._update_vertices(np.unique(np.concatenate([u, nb[ok]])))
+
+    def _compute_shortest_path(self):
+        g, rhs, queue = self.g, self.rhs, self.open_list
+        s = self.start_node
+        expanded = 0
+        while queue:
+            # 起点一致且队列中全部键都大于起点键 (h(s) = 0) 时结束
+            if rhs[s] == g[s] and queue.lower_bound() > min(g[s], rhs[s]) + self.km:
+                break
+            bucket, u, _ = queue.pop_bucket()
+            # 惰性删除：已一致的节点直接丢弃，键值过期 (km / g / rhs 变化) 落到更高桶的重新入堆
+            u = np.unique(u)
+            u = u[g[u] != rhs[u]]
+            k1 = self._k1(u)
+            late = (k1 // queue.width).astype(np.int64) > bucket
+            if rhs[s] == g[s]:
+                # 起点已一致时只处理键不大于起点键的节点 (与逐个出堆的终止条件一致)，其余放回队列；
+                # 本桶内只剩键大于起点键的节点时，后续桶的键也都更大，可以结束。
+                # 比较留 1e-9 余量：km 累加的浮点误差会让与起点键本应相等的键略大而被漏处理
+                beyond = ~late & (k1 > g[s] + self.km + 1e-9)
+                if beyond.any() and (late | beyond).all():
+                    self._push(u)
+                    break
+                late |= beyond
+            if late.any():
+                self._push(u[late])
+                u = u[~late]
+            if not len(u):
+                continue
+
+            # 本桶内有欠一致节点时只抬高它们，过一致节点放回本桶：抬高会让依赖它们的前驱变为欠一致
+            # (键同样可能落在本桶)，过早下降会用即将失效的 g 传播，之后被反复抬高 / 下降
+            under = u[g[u] < rhs[u]]
+            if len(under):
+                self._raise(under)
+                self._push(u[g[u] > rhs[u]])
+                expanded += len(under)
+                continue
+            self._lower(u)
+            expanded += len(u)
+        self.total_expanded += expanded
+        return expanded
+
+    # --- 对外接口 ---
+    def plan(self, start):
+        # 首次规划或仅起点移动时调用；start 为世界坐标
+        t0 = time.perf_counter()
+        self._move_start(start)
+        expanded = self._compute_shortest_path()
+        return self._result(expanded, time.perf_counter() - t0)
+
+    def update(self, changed, start=None):
+        # changed: 状态发生变化的体素 (grid 上的扁平下标，或 (N, 3) 体素下标)
+        # start: 新的起点世界坐标 (可选)。只修复受影响的搜索状态
+        t0 = time.perf_counter()
+        changed = np.asarray(changed, dtype=np.int64)
+        if changed.ndim == 2:
+            cells = changed
+        else:
+            cells = np.stack(np.unravel_index(changed, self.grid.shape), axis=-1)
+        nodes = cells @ self.strides + self.origin
+
+        # 只有可通行性翻转的体素会改变边代价 (迷雾 0 -> 自由 1 不需要任何修复)
+        new_free = np.isin(self.grid.take(np.ravel_multi_index(tuple(cells.T), self.grid.shape)), self.passable)
+        flipped = nodes[new_free != self.free[nodes]]
+        self.free[flipped] = ~self.free[flipped]
+
+        if start is not None:
+            self._move_start(start)
+
+        if len(flipped):
+            # 受影响的顶点：翻转体素自身及其 26 邻域 (防穿角规则也只涉及该邻域)，一次批量重算
+            affected = np.unique((flipped[:, None] + np.append(self.offsets, 0)).ravel())
+            affected = affected[self.free[affected] | np.isin(affected, flipped)]
+            self._update_vertices(affected)
+
+        expanded = self._compute_shortest_path()
+        elapsed = time.perf_counter() - t0
+        self.last_update = UpdateStats(len(cells), len(flipped), expanded, elapsed)
+        return self._result(expanded, elapsed)
+
+    def _move_start(self, start):
+        s_cell = self.snap_to_free(self.world_to_cell(start))
+        if s_cell is None:
+            raise ValueError("起点附近没有可通行体素")
+        node = self.cell_to_node(s_cell)
+        if self.start_node is not None:
+            # D* Lite 键值修正：km 累加新旧起点之间的启发距离
+            self.km += float(self._h(np.array([node]))[0])
+        self.start_node = node
+        self.start_cell = s_cell
+
+    def _result(self, expanded, elapsed):
+        s, t = self.start_node, self.goal_node
+        if not np.isfinite(self.g[s]):
+            return PlanResult(np.empty((0, 3)), np.inf, expanded, elapsed, np.empty((0, 3), int))
+
+        # 沿 c + g 最小的后继贪心下降到终点
+        nodes = [s]
+        while nodes[-1] != t and len(nodes) <= self.free.size:
+            nb, ok = self._expand(np.array([nodes[-1]]))
+            cost = np.where(ok[0], self.g[nb[0]] + self.step_costs, np.inf)
+            nodes.append(int(nb[0, np.argmin(cost)]))
+        cells = self.node_to_cell(np.array(nodes))
+        path = cells * self.res + self.res / 2.0
+        return PlanResult(path, float(self.g[s]) * self.res, expanded, elapsed, cells)
+
+
+def check_against_astar(env, rounds=6, seed=0):
+    # 校验：沿当前路径连续插入障碍并移动起点，每次增量修复后的代价须与冷启动 A* 一致
+    # (会修改 env.grid)；返回每轮 (增量代价, 冷启动代价, 重扩展节点数)
+    rng = np.random.default_rng(seed)
+    planner = IncrementalPlanner.from_env(env)
+    start = np.array(env.start, dtype=np.float64)
+    r = planner.plan(start)
+    rows = []
+    for i in range(rounds):
+        before = env.grid.copy()
+        if len(r.cells) > 8:
+            # 障碍放在路径中段 (远离起终点，不改变吸附结果)
+            c = r.cells[rng.integers(len(r.cells) // 4, 3 * len(r.cells) // 4)]
+            env.add_block(np.maximum(c - 1, 0) * env.res, [1.5, 1.5, 1.5], state=2)
+        if i % 2 and len(r.path) > 8:
+            start = r.path[4]
+        r = planner.update(np.flatnonzero(before != env.grid), start=start)
+        cold = GridPlanner(env.grid, env.res).plan(start, env.goal, method='astar')
+        assert r.found == cold.found and (not r.found or abs(r.cost - cold.cost) < 1e-6), (i, r.cost, cold.cost)
+        rows.append((r.cost, cold.cost, planner.last_update.expanded))
+    return rows
+
+
+if __name__ == "__main__":
+    VoxelEnvironment = importlib.import_module('3d_voxel').VoxelEnvironment
+    env = VoxelEnvironment()
+    env.create_custom_scene()
+
+    if '--check' in sys.argv:
+        for i, (cost, cold, expanded) in enumerate(check_against_astar(env)):
+            print(f"[校验 {i}] 增量: {cost:.4f}m | 冷启动 A*: {cold:.4f}m | 重扩展: {expanded}")
+        sys.exit(0)
+
+    planner = IncrementalPlanner.from_env(env)
+    r = planner.plan(env.start)
+    print(f"[初次规划] 长度: {r.cost:.2f}m | 扩展节点: {r.expanded} | 耗时: {r.elapsed:.4f}s")
+
+    # 在路径中段放置一块障碍，模拟扫描揭示出新的墙体
+    mid = r.cells[len(r.cells) // 2]
+    lo = np.maximum(mid - 2, 0)
+    before = env.grid.copy()
+    env.add_block(lo * env.res, [2.5, 2.5, 2.5], state=2)
+    changed = np.flatnonzero(before != env.grid)
+    r = planner.update(changed)
+    s = planner.last_update
+    print(f"[增量修复] 变化体素: {s.changed} | 翻转: {s.flipped} | 重扩展: {s.expanded} | "
+          f"耗时: {s.elapsed:.4f}s | 新长度: {r.cost:.2f}m")
@@ -0,0 +1,159 @@
+import importlib
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from profiling import PROFILER, timed
+
+# 视线遮挡状态下限：2 内墙, 3 外围墙, 4 地板/天花板, 5 楼梯
+BLOCKING_MIN = 2
+
+
+def traverse_segments(a, b):
+    # 批量求体素中心连线 a[i] -> b[i] 经过的全部体素，返回 (cells, seg)：体素下标及其所属线段
+    #
+    # 向量化 3D DDA (Amanatides-Woo)：线段依次穿过的体素，等价于按参数 t 排序后的各轴边界穿越序列。
+    # 对所有线段一次性生成穿越点、排序、累加步进，不需要逐步的 Python 循环。
+    # 恰好穿过棱 / 角 (多个轴同 t 穿越) 时保守处理：两侧体素都计入 (与规划器的防穿角规则一致)
+    a = np.atleast_2d(np.asarray(a, dtype=np.int64))
+    b = np.atleast_2d(np.asarray(b, dtype=np.int64))
+    n_seg = len(a)
+    d = b - a
+    step = np.sign(d)
+    counts = np.abs(d)
+
+    # --- 1. 生成所有 (线段, 轴) 的边界穿越参数 t = (j + 0.5) / |d| ---
+    rep = counts.ravel()
+    per_seg = counts.sum(axis=1)
+    total = int(rep.sum())
+    seg = np.repeat(np.arange(n_seg), per_seg)
+    axis = np.repeat(np.tile(np.arange(3), n_seg), rep)
+    j = np.arange(total) - np.repeat(np.cumsum(rep) - rep, rep)
+    t = (j + 0.5) / np.repeat(np.maximum(rep, 1), rep)
+
+    # --- 2. 每条线段内按 t 排序 (t ∈ (0, 1)，以 seg + t 为键即可分组排序) ---
+    order = np.argsort(seg + t, kind='stable')
+    seg, axis, t = seg[order], axis[order], t[order]
+
+    # --- 3. 累加步进得到每次穿越后所在体素 ---
+    moves = np.zeros((total, 3), dtype=np.int64)
+    moves[np.arange(total), axis] = step[seg, axis]
+    cum = np.cumsum(moves, axis=0)
+    first = np.cumsum(per_seg) - per_seg
+    base = np.zeros((n_seg, 3), dtype=np.int64)
+    nonempty = per_seg > 0
+    base[nonempty] = cum[first[nonempty]] - moves[first[nonempty]]
+    cells = a[seg] + cum - base[seg]
+
+    # --- 4. 同 t 穿越 (棱 / 角) 补查另一侧体素 ---
+    out_cells, out_seg = [a, cells], [np.arange(n_seg), seg]
+    tie = np.zeros(total, dtype=bool)
+    tie[1:] = (seg[1:] == seg[:-1]) & (t[1:] == t[:-1])
+    m = np.flatnonzero(tie)
+    if len(m):
+        # 两轴同 t：另一种先后顺序经过的体素
+        out_cells.append(cells[m] - moves[m - 1])
+        out_seg.append(seg[m])
+        m3 = m[tie[m - 1]]
+        if len(m3):
+            # 三轴同 t (穿过角点)：补齐其余子集组合
+            out_cells += [cells[m3] - moves[m3 - 2], cells[m3] - moves[m3 - 1] - moves[m3 - 2]]
+            out_seg += [seg[m3], seg[m3]]
+    return np.concatenate(out_cells), np.concatenate(out_seg)
+
+
+def segments_clear(clear, strides, a, b, origin=0):
+    # 批量判断线段是否无遮挡；clear 为扁平布尔数组 (True 为可透视)，或接受扁平下标、返回布尔数组的函数
+    # (按需读取经过的体素，不需要整张掩码)；strides / origin 描述体素下标到扁平下标的映射
+    cells, seg = traverse_segments(a, b)
+    idx = cells @ strides + origin
+    ok = clear(idx) if callable(clear) else clear[idx]
+    visible = np.ones(len(np.atleast_2d(a)), dtype=bool)
+    visible[seg[~ok]] = False
+    return visible
+
+
+class LineOfSight:
+    # 带 LRU 缓存的批量视线查询服务；缓存以 (cell_a, cell_b) 为键，环境版本号变化时整体失效
+
+    def __init__(self, env, capacity=200_000):
+        self.env = env
+        self.capacity = capacity
+        self.cache = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def _sync(self):
+        # 只清空缓存；遮挡判断在遍历时按需读取 grid，版本变化不需要整网格扫描
+        if self.version != self.env.version:
+            self.cache.clear()
+            self.version = self.env.version
+
+    def _clear(self, idx):
+        return self.env.grid.take(idx) < BLOCKING_MIN
+
+    @timed('los.query')
+    def query(self, a, b):
+        # a, b: (N, 3) 或 (3,) 世界坐标，返回 (N,) 布尔可见性
+        self._sync()
+        shape = np.array(self.env.grid_shape)
+        ca = np.clip((np.atleast_2d(a) / self.env.res).astype(np.int64), 0, shape - 1)
+        cb = np.clip((np.atleast_2d(b) / self.env.res).astype(np.int64), 0, shape - 1)
+        strides = np.array([shape[1] * shape[2], shape[2], 1])
+        fa, fb = ca @ strides, cb @ strides
+
+        # 视线对称：键取 (min, max)，合成为单个整数
+        n = int(np.prod(shape))
+        keys = (np.minimum(fa, fb) * n + np.maximum(fa, fb)).tolist()
+        result = np.empty(len(keys), dtype=bool)
+        miss = []
+        cache = self.cache
+        for i, k in enumerate(keys):
+            v = cache.get(k)
+            if v is None:
+                miss.append(i)
+            else:
+                cache.move_to_end(k)
+                result[i] = v
+        self.hits += len(keys) - len(miss)
+        self.misses += len(miss)
+        PROFILER.count('los.cache_hits', len(keys) - len(miss))
+        PROFILER.count('los.cache_misses', len(miss))
+
+        if miss:
+            miss = np.array(miss)
+            # 空域跳过：包围盒在占据金字塔中无实体块的线段直接判为可见，其余再做 DDA 遍历
+            a, b = ca[miss], cb[miss]
+            vis = np.ones(len(miss), dtype=bool)
+            maybe = self.env.pyramid.boxes_any_solid(np.minimum(a, b), np.maximum(a, b) + 1)
+            if maybe.any():
+                vis[maybe] = segments_clear(self._clear, strides, a[maybe], b[maybe])
+            result[miss] = vis
+            for k, v in zip((keys[i] for i in miss.tolist()), vis.tolist()):
+                cache[k] = v
+            while len(cache) > self.capacity:
+                cache.popitem(last=False)
+        return result
+
+
+if __name__ == "__main__":
+    VoxelEnvironment = importlib.import_module('3d_voxel').VoxelEnvironment
+    env = VoxelEnvironment()
+    env.create_custom_scene()
+
+    # 吞吐量基准：楼内随机线段 (长度 0~20m)
+    rng = np.random.default_rng(0)
+    n = 20000
+    a = rng.uniform([10, 12, 1], [114, 68, 12], size=(n, 3))
+    b = np.clip(a + rng.uniform(-20, 20, size=(n, 3)), 0, env.dims - 1e-6)
+
+    t0 = time.perf_counter()
+    vis = env.line_of_sight(a, b)
+    cold = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    env.line_of_sight(a, b)
+    warm = time.perf_counter() - t0
+    print(f"[视线] 线段: {n} | 可见: {vis.mean():.1%} | 冷查询: {n / cold:,.0f} 段/s | "
+          f"缓存命中: {n / warm:,.0f} 段/s")
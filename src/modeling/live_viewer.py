@@ -0,0 +1,228 @@
+import importlib
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+try:
+    import open3d as o3d
+except ImportError:  # 无图形环境下以无头模式运行 (只维护渲染状态与计数，便于基准测试)
+    o3d = None
+
+# 6 邻域偏移 (表面判定)
+FACE_OFFSETS = np.array([(1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)])
+
+
+@dataclass
+class FrameStats:
+    changed: int = 0        # 本帧处理的渲染状态真正变化的体素数
+    added: int = 0          # 新增 / 重新着色的渲染体素
+    removed: int = 0        # 移除的渲染体素
+    pending: int = 0        # 超出帧预算、留到下一帧的脏体素数
+    elapsed: float = 0.0    # 本帧耗时 (秒)
+    over_budget: bool = False
+
+
+class LiveViewer:
+    # 实时仿真循环的非阻塞查看器：构造时挂接到 env，add_block / notify_changed 登记脏体素，
+    # 每帧 update() 只对脏体素及其 6 邻域 (表面判定) 做差分，增删对应的渲染体素；
+    # 路径折线与起终点球体原地更新，不重建几何体。脏体素按帧预算分批处理，剩余留到下一帧
+
+    def __init__(self, env, surface_only=True, frame_budget=1 / 30, chunk=20_000, headless=False):
+        self.env = env
+        self.surface_only = surface_only
+        self.frame_budget = frame_budget
+        self.chunk = chunk
+        self.headless = headless or o3d is None
+        self.shape = tuple(int(v) for v in env.grid_shape)
+        self.pending = []
+
+        self.frames = 0
+        self.total_changed = 0
+        self.over_budget_frames = 0
+        self.last_frame = FrameStats()
+
+        self.vis = None
+        self.running = True
+        env.viewer = self
+        self.refresh()
+
+    # --- 脏体素登记 (由 env 调用) ---
+    def mark_cells(self, indices):
+        self.pending.append(np.asarray(indices, dtype=np.int64))
+
+    def mark_box(self, lo, hi):
+        lo, hi = np.asarray(lo), np.asarray(hi)
+        if np.any(hi <= lo):
+            return
+        axes = [np.arange(lo[i], hi[i]) for i in range(3)]
+        self.pending.append(np.ravel_multi_index(np.ix_(*axes), self.shape).ravel())
+
+    # --- 全量构建 (首帧或 render_config 切换后) ---
+    def refresh(self):
+        env = self.env
+        mask = env.render_mask()
+        # rendered: 每个体素的渲染状态 (不渲染为 0)；shown: 实际绘制的体素 (表面模式下只含表面)
+        self.rendered = np.where(mask, np.asarray(env.grid), 0).astype(np.int8)
+        self.shown = env.surface_mask(mask) if self.surface_only else mask
+        self.pending.clear()
+        if not self.headless:
+            self._build_geometry()
+
+    def _build_geometry(self):
+        env = self.env
+        points = np.argwhere(self.shown) * env.res + env.res / 2.0
+        pcd = o3d.geometry.PointCloud()
+        pcd.points = o3d.utility.Vector3dVector(points)
+        pcd.colors = o3d.utility.Vector3dVector(env.render_cells(np.argwhere(self.shown))[1])
+        # 原点固定在 (0, 0, 0)，体素的 grid_index 即其网格下标，便于逐个增删
+        voxels = o3d.geometry.VoxelGrid.create_from_point_cloud_within_bounds(
+            pcd, voxel_size=env.res, min_bound=np.zeros(3), max_bound=env.dims.astype(float))
+
+        if self.vis is not None:
+            # 再次 refresh 只替换体素网格；坐标系、起终点球体与路径折线保留原状
+            self.vis.remove_geometry(self.voxels, reset_bounding_box=False)
+            self.voxels = voxels
+            self.vis.add_geometry(self.voxels, reset_bounding_box=False)
+            return
+
+        self.voxels = voxels
+        self.start_pos, self.goal_pos = env.start.copy(), env.goal.copy()
+        self.start_node = o3d.geometry.TriangleMesh.create_sphere(radius=1.5)
+        self.start_node.paint_uniform_color([0.2, 0.8, 0.2]); self.start_node.translate(self.start_pos)
+        self.goal_node = o3d.geometry.TriangleMesh.create_sphere(radius=1.5)
+        self.goal_node.paint_uniform_color([0.9, 0.1, 0.1]); self.goal_node.translate(self.goal_pos)
+        self.path_line = o3d.geometry.LineSet()
+
+        self.vis = o3d.visualization.Visualizer()
+        self.vis.create_window(window_name="3D Voxel Scene - Live", width=2560, height=1440)
+        self.vis.get_render_option().background_color = np.asarray([0.05, 0.05, 0.05])
+        self.vis.add_geometry(o3d.geometry.TriangleMesh.create_coordinate_frame(size=10.0))
+        for geom in (self.voxels, self.start_node, self.goal_node, self.path_line):
+            self.vis.add_geometry(geom, reset_bounding_box=False)
+        self.vis.reset_view_point(True)
+        self.vis.get_view_control().set_zoom(0.4)
+
+    # --- 逐帧更新 ---
+    def update(self, path=None):
+        # path: (N, 3) 世界坐标折线 (可选，传入即原地替换)；返回本帧 FrameStats
+        t0 = time.perf_counter()
+        stats = FrameStats()
+
+        dirty = np.unique(np.concatenate(self.pending)) if self.pending else np.empty(0, dtype=np.int64)
+        self.pending.clear()
+        done = 0
+        while done < len(dirty):
+            self._apply(dirty[done:done + self.chunk], stats)
+            done += self.chunk
+            if time.perf_counter() - t0 > self.frame_budget:
+                break
+        if done < len(dirty):
+            self.pending.append(dirty[done:])
+            stats.pending = len(dirty) - done
+
+        if not self.headless:
+            if stats.added or stats.removed:
+                self.vis.update_geometry(self.voxels)
+            if path is not None:
+                self._update_path(np.asarray(path, dtype=np.float64))
+            self._update_markers()
+            self.running = self.vis.poll_events()
+            self.vis.update_renderer()
+
+        stats.elapsed = time.perf_counter() - t0
+        stats.over_budget = stats.elapsed > self.frame_budget
+        self.frames += 1
+        self.total_changed += stats.changed
+        self.over_budget_frames += stats.over_budget
+        self.last_frame = stats
+        return stats
+
+    def _apply(self, flat, stats):
+        # 1. 只保留渲染状态真正变化的体素 (如扫描揭示 0 -> 1 不影响渲染，直接跳过)
+        cells = np.stack(np.unravel_index(flat, self.shape), axis=-1)
+        new_state, _ = self.env.render_cells(cells)
+        real = new_state != self.rendered.ravel()[flat]
+        flat, cells = flat[real], cells[real]
+        if len(flat) == 0:
+            return
+        self.rendered.ravel()[flat] = new_state[real]
+        stats.changed += len(flat)
+
+        # 2. 表面模式下，变化体素的 6 邻域表面状态也可能改变
+        region = cells
+        if self.surface_only:
+            region = np.unique(np.vstack([cells, (cells[:, None] + FACE_OFFSETS).reshape(-1, 3)]), axis=0)
+            region = region[np.all((region >= 0) & (region < self.shape), axis=1)]
+        show = self.rendered[tuple(region.T)] > 0
+        if self.surface_only:
+            nbr = region[:, None] + FACE_OFFSETS
+            inside = np.all((nbr >= 0) & (nbr < self.shape), axis=2)
+            nbr_on = np.zeros(inside.shape, dtype=bool)
+            nbr_on[inside] = self.rendered[tuple(nbr[inside].T)] > 0
+            show &= ~nbr_on.all(axis=1)
+
+        # 3. 差分：新出现或状态 (颜色) 变化的体素重新写入，消失的体素移除
+        was = self.shown[tuple(region.T)]
+        recolor = np.isin(np.ravel_multi_index(tuple(region.T), self.shape), flat)
+        add, remove = region[show & (~was | recolor)], region[~show & was]
+        self.shown[tuple(region.T)] = show
+        stats.added += len(add)
+        stats.removed += len(remove)
+        if self.headless:
+            return
+        for idx in remove.tolist():
+            self.voxels.remove_voxel(idx)
+        for idx, color in zip(add, self.env.render_cells(add)[1]):
+            self.voxels.add_voxel(o3d.geometry.Voxel(idx, color))
+
+    def _update_path(self, path):
+        self.path_line.points = o3d.utility.Vector3dVector(path)
+        lines = np.column_stack([np.arange(len(path) - 1), np.arange(1, len(path))])
+        self.path_line.lines = o3d.utility.Vector2iVector(lines)
+        self.path_line.paint_uniform_color([1.0, 0.85, 0.1])
+        self.vis.update_geometry(self.path_line)
+
+    def _update_markers(self):
+        # 起终点移动时平移已有球体，不重新生成网格
+        for node, pos, attr in ((self.start_node, self.env.start, 'start_pos'),
+                                (self.goal_node, self.env.goal, 'goal_pos')):
+            delta = pos - getattr(self, attr)
+            if np.any(delta):
+                node.translate(delta)
+                setattr(self, attr, np.array(pos, dtype=np.float64))
+                self.vis.update_geometry(node)
+
+    def close(self):
+        if self.vis is not None:
+            self.vis.destroy_window()
+            self.vis = None
+        self.env.viewer = None
+
+
+if __name__ == "__main__":
+    VoxelEnvironment = importlib.import_module('3d_voxel').VoxelEnvironment
+    SectorScanner = importlib.import_module('dif_scan').SectorScanner
+    IncrementalPlanner = importlib.import_module('incremental_planner').IncrementalPlanner
+    env = VoxelEnvironment()
+    env.create_custom_scene()
+
+    # 扫描 / 重规划循环：沿西楼一层走廊前进，途中揭示一段新墙体
+    viewer = LiveViewer(env, headless='--headless' in sys.argv)
+    scanner = SectorScanner(env.res)
+    planner = IncrementalPlanner.from_env(env)
+    r = planner.plan(env.start)
+    for i, x in enumerate(np.arange(16.0, 60.0, 2.0)):
+        changed = scanner.scan(env, [[x, 45.0, 1.8, 0.0]])
+        if i == 10:
+            before = env.grid.copy()
+            env.add_block([x + 4.0, 40.0, 1.0], [1.0, 10.0, 5.0], state=2)
+            r = planner.update(np.flatnonzero(before != env.grid))
+        stats = viewer.update(path=r.path)
+        print(f"[帧 {viewer.frames:>2}] 揭示: {len(changed):>6} | 渲染变化: {stats.changed:>4} | "
+              f"+{stats.added} / -{stats.removed} | 耗时: {stats.elapsed * 1000:.1f}ms")
+        if not viewer.running:
+            break
+    print(f"[汇总] 帧数: {viewer.frames} | 超预算帧: {viewer.over_budget_frames} | 渲染变化体素: {viewer.total_changed}")
+    viewer.close()
@@ -0,0 +1,185 @@
+import importlib
+import math
+import time
+
+import numpy as np
+
+from grid_planner import PASSABLE_STATES, BucketQueue, GridPlanner, PlanResult
+from line_of_sight import BLOCKING_MIN
+
+STAIR_STATE = 5
+
+# 水平 8 邻域 (dx, dy)
+HORIZONTAL_OFFSETS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)])
+
+
+class NavGraph:
+    # 地面智能体的可行走表面导航图：节点为可站立体素，边按台阶高度 / 楼梯规则连接，CSR 存储
+    #   可站立：体素可通行，正下方为实体 (状态 2~5)，且向上有 agent_height 的净空
+    #   连边：水平 8 邻域，高度差不超过 step_height；任一端站在楼梯 (状态 5) 上时放宽到 stair_step
+    #         斜向移动要求同层且两个轴向邻居均可站立 (防穿角)；升降时起点需多出高度差的净空
+    # 边为无向 (双向存储)，代价为欧氏距离 (米)
+
+    def __init__(self, grid, res, agent_height=1.5, step_height=0.3, stair_step=0.5,
+                 passable=PASSABLE_STATES):
+        t0 = time.perf_counter()
+        self.res = res
+        self.grid_shape = np.array(grid.shape)
+        states = np.asarray(grid)
+        free = np.isin(states, passable)
+        head = int(math.ceil(agent_height / res))
+        step = int(step_height / res + 1e-9)
+        stair = int(stair_step / res + 1e-9)
+
+        # --- 1. 可站立体素：向上连续可通行的长度 run >= head，且下方为实体 ---
+        run = np.zeros(free.shape, dtype=np.int32)
+        run[..., -1] = free[..., -1]
+        for z in range(free.shape[2] - 2, -1, -1):
+            run[..., z] = np.where(free[..., z], run[..., z + 1] + 1, 0)
+        support = np.zeros(free.shape, dtype=np.int8)
+        support[..., 1:] = states[..., :-1]
+        stand = (run >= head) & (support >= BLOCKING_MIN)
+        on_stair = support == STAIR_STATE
+
+        cells = np.argwhere(stand)
+        node_id = np.full(free.shape, -1, dtype=np.int32)
+        node_id[tuple(cells.T)] = np.arange(len(cells), dtype=np.int32)
+
+        # --- 2. 按 (dx, dy, dz) 批量生成边 ---
+        src, dst, cost = [], [], []
+        x, y, z = cells.T
+        rise = max(step, stair)
+        for dx, dy in HORIZONTAL_OFFSETS.tolist():
+            nx, ny = x + dx, y + dy
+            inside = (nx >= 0) & (nx < free.shape[0]) & (ny >= 0) & (ny < free.shape[1])
+            for dz in range(-rise, rise + 1):
+                if dx and dy and dz:
+                    continue
+                nz = z + dz
+                ok = inside & (nz >= 0) & (nz < free.shape[2])
+                i = np.flatnonzero(ok)
+                j = node_id[nx[i], ny[i], nz[i]]
+                keep = j >= 0
+                i, j = i[keep], j[keep]
+                if abs(dz) > step:
+                    # 超出普通台阶高度，只允许楼梯上的升降
+                    keep = on_stair[x[i], y[i], z[i]] | on_stair[nx[i], ny[i], nz[i]]
+                    i, j = i[keep], j[keep]
+                if dz > 0:
+                    # 上行：起点上方要多出 dz 的净空 (下行由反向边对称覆盖)
+                    keep = run[x[i], y[i], z[i]] >= head + dz
+                    i, j = i[keep], j[keep]
+                elif dz < 0:
+                    keep = run[nx[i], ny[i], nz[i]] >= head - dz
+                    i, j = i[keep], j[keep]
+                if dx and dy:
+                    keep = (node_id[nx[i], y[i], z[i]] >= 0) & (node_id[x[i], ny[i], z[i]] >= 0)
+                    i, j = i[keep], j[keep]
+                src.append(i)
+                dst.append(j)
+                cost.append(np.full(len(i), math.sqrt(dx * dx + dy * dy + dz * dz) * res))
+
+        # --- 3. 打包为 CSR (int32 下标，float32 边代价) ---
+        src, dst, cost = np.concatenate(src), np.concatenate(dst), np.concatenate(cost)
+        order = np.argsort(src, kind='stable')
+        self.indices = dst[order].astype(np.int32)
+        self.weights = cost[order].astype(np.float32)
+        self.indptr = np.zeros(len(cells) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(src, minlength=len(cells)), out=self.indptr[1:])
+        self.cells = cells.astype(np.int32)
+        self.build_elapsed = time.perf_counter() - t0
+
+    @classmethod
+    def from_env(cls, env, **kwargs):
+        return cls(env.grid, env.res, **kwargs)
+
+    # --- 统计 ---
+    @property
+    def num_nodes(self):
+        return len(self.cells)
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes + self.cells.nbytes
+
+    # --- 查询 ---
+    def nearest_node(self, xyz):
+        # 世界坐标 -> 最近的可站立节点
+        cell = np.asarray(xyz) / self.res - 0.5
+        return int(np.argmin(np.sum((self.cells - cell) ** 2, axis=1)))
+
+    def plan(self, start, goal):
+        # A*：start / goal 为世界坐标，各自吸附到最近的可站立节点
+        # 与 GridPlanner._astar 相同的分桶批量扩展 (桶宽一个体素边长)：整桶节点的出边按 CSR 一次
+        # 收集并松弛，g / parent 为按节点编号的数组；已关闭节点 g 变小时重新打开，
+        # 堆顶桶的 f 下界不小于 g(t) 时终止
+        t0 = time.perf_counter()
+        s, t = self.nearest_node(start), self.nearest_node(goal)
+        n = self.num_nodes
+        g = np.full(n, np.inf)
+        parent = np.full(n, -1, dtype=np.int32)
+        closed = np.zeros(n, dtype=bool)
+        g[s], parent[s] = 0.0, s
+        goal = self.cells[t] * self.res
+        heap = BucketQueue(self.res)
+        heap.push(np.array([s]), np.zeros(1), np.zeros(1))
+        expanded = 0
+        while heap:
+            if heap.lower_bound() >= g[t]:
+                break
+            u = heap.pop(g)
+            u = u[~closed[u]]
+            if not len(u):
+                continue
+            closed[u] = True
+            expanded += len(u)
+
+            # 整桶出边：e 为各节点 [indptr[u], indptr[u+1]) 区间拼接后的边下标
+            lo, cnt = self.indptr[u], self.indptr[u + 1] - self.indptr[u]
+            e = np.arange(cnt.sum()) + np.repeat(lo - (np.cumsum(cnt) - cnt), cnt)
+            src, v = np.repeat(u, cnt), self.indices[e]
+            tent = g[src] + self.weights[e]
+            ok = tent < g[v]
+            v, tent, src = v[ok], tent[ok], src[ok]
+            order = np.lexsort((tent, v))
+            v, tent, src = v[order], tent[order], src[order]
+            first = np.ones(len(v), dtype=bool)
+            first[1:] = v[1:] != v[:-1]
+            v, tent = v[first], tent[first]
+            g[v] = tent
+            parent[v] = src[first]
+            closed[v] = False
+            if len(v):
+                # 启发值为到终点的欧氏距离
+                heap.push(v, tent + np.sqrt(np.sum((self.cells[v] * self.res - goal) ** 2, axis=1)), tent)
+
+        if not np.isfinite(g[t]):
+            return PlanResult(np.empty((0, 3)), np.inf, expanded, time.perf_counter() - t0, np.empty((0, 3), int))
+        nodes = [t]
+        while nodes[-1] != s:
+            nodes.append(int(parent[nodes[-1]]))
+        cells = self.cells[nodes[::-1]].astype(np.int64)
+        path = cells * self.res + self.res / 2.0
+        return PlanResult(path, float(g[t]), expanded, time.perf_counter() - t0, cells)
+
+
+if __name__ == "__main__":
+    VoxelEnvironment = importlib.import_module('3d_voxel').VoxelEnvironment
+    env = VoxelEnvironment()
+    env.create_custom_scene()
+
+    nav = NavGraph.from_env(env)
+    grid_bytes = env.grid.size * env.grid.dtype.itemsize
+    print(f"[导航图] 节点: {nav.num_nodes} / 体素 {env.grid.size} ({nav.num_nodes / env.grid.size:.2%}) | "
+          f"边: {nav.num_edges} | 内存: {nav.nbytes / 2**20:.2f}MB / 网格 {grid_bytes / 2**20:.2f}MB | "
+          f"构建: {nav.build_elapsed:.3f}s")
+
+    r = nav.plan(env.start, env.goal)
+    print(f"[导航图 A*] 路径点: {len(r.path)} | 长度: {r.cost:.2f}m | 扩展节点: {r.expanded} | 耗时: {r.elapsed:.4f}s")
+    g = GridPlanner.from_env(env).plan(env.start, env.goal, method='astar')
+    print(f"[全体素 A*] 路径点: {len(g.path)} | 长度: {g.cost:.2f}m | 扩展节点: {g.expanded} | 耗时: {g.elapsed:.4f}s | "
+          f"加速比: {g.elapsed / r.elapsed:.1f}x")
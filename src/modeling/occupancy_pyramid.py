@@ -0,0 +1,152 @@
+import importlib
+import time
+
+import numpy as np
+
+from line_of_sight import BLOCKING_MIN
+
+# 状态划分：0 迷雾, 1 自由空间, >= 2 实体 (墙 / 地板 / 楼梯，既不可通行也遮挡视线)
+FOG, FREE = 0, 1
+
+# 一个块的 8 个子块偏移
+CHILD_OFFSETS = np.array([(dx, dy, dz) for dx in (0, 1) for dy in (0, 1) for dz in (0, 1)])
+
+
+def _reduce(any_solid, all_solid, all_free, any_fog):
+    # 2x2x2 下采样一层：any_* 取或，all_* 取与；奇数边长以边缘复制补齐 (不改变或 / 与的结果)
+    pad = [(0, n % 2) for n in any_solid.shape]
+    out = []
+    for a, op in ((any_solid, np.any), (all_solid, np.all), (all_free, np.all), (any_fog, np.any)):
+        a = np.pad(a, pad, mode='edge') if any(p for _, p in pad) else a
+        x, y, z = (n // 2 for n in a.shape)
+        out.append(op(a.reshape(x, 2, y, 2, z, 2), axis=(1, 3, 5)))
+    return out
+
+
+def _classify(states):
+    # 体素状态 -> 第 0 层的四项摘要
+    solid = states >= BLOCKING_MIN
+    return solid, solid, states == FREE, states == FOG
+
+
+class OccupancyPyramid:
+    # 多级占据金字塔：第 k 层每个块覆盖 2^k 边长的体素立方体，记录四项摘要
+    #   any_solid  块内存在实体体素        all_solid  块内全部为实体
+    #   all_free   块内全部为已知自由空间  any_fog    块内存在迷雾
+    # 用于规划 / 视线的空域跳过与粗到细搜索；add_block 与扫描揭示后增量更新受影响的块
+
+    def __init__(self, grid, levels=None):
+        self.grid = grid
+        self.shape = np.array(grid.shape)
+        if levels is None:
+            # 默认 2x ~ 16x，且最粗层仍多于一个块
+            levels = 1
+            while levels < 4 and np.any(-(-self.shape // 2 ** (levels + 1)) > 1):
+                levels += 1
+        self.levels = levels
+        self.any_solid, self.all_solid, self.all_free, self.any_fog = [], [], [], []
+        self.rebuild()
+
+    def rebuild(self):
+        # 沿 x 轴按 2^levels 厚的板逐段读取并下采样 (各板在每层都恰好对齐到块边界)，
+        # 分块存储无需展开整张稠密网格，稠密网格的切片也只是视图
+        t0 = time.perf_counter()
+        thick = 2 ** self.levels
+        slabs = []
+        for x0 in range(0, self.shape[0], thick):
+            cur = _classify(np.asarray(self.grid[x0:x0 + thick, :, :]))
+            per_level = []
+            for _ in range(self.levels):
+                cur = _reduce(*cur)
+                per_level.append(cur)
+            slabs.append(per_level)
+        for i, store in enumerate((self.any_solid, self.all_solid, self.all_free, self.any_fog)):
+            store[:] = [np.concatenate([slab[k][i] for slab in slabs]) for k in range(self.levels)]
+        self.last_elapsed = time.perf_counter() - t0
+
+    # --- 访问 ---
+    def block_shape(self, level):
+        return self.any_solid[level - 1].shape
+
+    def summary(self, level):
+        # 返回第 level 层 (1 为 2x) 的 (any_solid, all_solid, all_free, any_fog) 布尔数组
+        k = level - 1
+        return self.any_solid[k], self.all_solid[k], self.all_free[k], self.any_fog[k]
+
+    def _child_summary(self, level, lo, hi):
+        # 读取第 level 层 [lo, hi) 块范围的四项摘要，第 0 层直接从体素网格读取
+        if level == 0:
+            return _classify(np.asarray(self.grid[lo[0]:hi[0], lo[1]:hi[1], lo[2]:hi[2]]))
+        return [a[lo[0]:hi[0], lo[1]:hi[1], lo[2]:hi[2]] for a in self.summary(level)]
+
+    # --- 增量更新 ---
+    def update_box(self, lo, hi):
+        # 体素盒 [lo, hi) 内状态被改写后调用 (如 add_block)，逐层只重算覆盖该盒的块
+        lo, hi = np.asarray(lo), np.asarray(hi)
+        if np.any(hi <= lo):
+            return
+        child_shape = self.shape
+        for level in range(1, self.levels + 1):
+            lo, hi = lo // 2, -(-hi // 2)
+            parts = _reduce(*self._child_summary(level - 1, lo * 2, np.minimum(hi * 2, child_shape)))
+            for a, p in zip(self.summary(level), parts):
+                a[lo[0]:hi[0], lo[1]:hi[1], lo[2]:hi[2]] = p
+            child_shape = np.array(self.block_shape(level))
+
+    def update_cells(self, indices):
+        # 零散体素变化后调用 (如扫描揭示)，indices 为扁平下标；按变化块逐层批量重算
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return
+        blocks = np.stack(np.unravel_index(indices, tuple(self.shape)), axis=-1)
+        child_shape = self.shape
+        for level in range(1, self.levels + 1):
+            blocks = np.unique(blocks // 2, axis=0)
+            # 越界子块夹到边缘 (与下采样时的边缘复制一致)
+            children = np.minimum(blocks[:, None] * 2 + CHILD_OFFSETS, child_shape - 1).reshape(-1, 3)
+            if level == 1:
+                states = self.grid.take(np.ravel_multi_index(tuple(children.T), tuple(child_shape)))
+                parts = _classify(states)
+            else:
+                parts = [a[tuple(children.T)] for a in self.summary(level - 1)]
+            idx = tuple(blocks.T)
+            for a, p, op in zip(self.summary(level), parts, (np.any, np.all, np.all, np.any)):
+                a[idx] = op(p.reshape(-1, 8), axis=1)
+            child_shape = np.array(self.block_shape(level))
+
+    # --- 查询 ---
+    def boxes_any_solid(self, lo, hi):
+        # 批量保守判断体素盒 [lo, hi) 内是否可能有实体：返回 False 即保证整盒无遮挡
+        # 每个盒选取块边长不小于其最大边长的层，此时每轴最多跨 2 个块，查 8 个角块即可覆盖
+        lo, hi = np.atleast_2d(lo), np.atleast_2d(hi)
+        extent = np.max(hi - lo, axis=1)
+        level = np.maximum(np.ceil(np.log2(np.maximum(extent, 1))).astype(int), 1)
+        out = np.ones(len(lo), dtype=bool)
+        for k in np.unique(level[level <= self.levels]).tolist():
+            sel = np.flatnonzero(level == k)
+            a = self.any_solid[k - 1]
+            b0, b1 = lo[sel] >> k, (hi[sel] - 1) >> k
+            hit = np.zeros(len(sel), dtype=bool)
+            for off in CHILD_OFFSETS:
+                c = np.where(off, b1, b0)
+                hit |= a[c[:, 0], c[:, 1], c[:, 2]]
+            out[sel] = hit
+        return out
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for store in (self.any_solid, self.all_solid, self.all_free, self.any_fog)
+                   for a in store)
+
+
+if __name__ == "__main__":
+    VoxelEnvironment = importlib.import_module('3d_voxel').VoxelEnvironment
+    env = VoxelEnvironment()
+    env.create_custom_scene()
+
+    pyr = env.pyramid
+    print(f"[占据金字塔] 层数: {pyr.levels} | 构建: {pyr.last_elapsed:.4f}s | 内存: {pyr.nbytes / 2**10:.0f}KB")
+    for level in range(1, pyr.levels + 1):
+        any_solid, all_solid, all_free, any_fog = pyr.summary(level)
+        print(f"  {2 ** level:>2}x {str(any_solid.shape):>15} | 无实体块: {(~any_solid).mean():.1%} | "
+              f"全实体块: {all_solid.mean():.1%} | 含迷雾块: {any_fog.mean():.1%}")
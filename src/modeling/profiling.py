@@ -0,0 +1,73 @@
+import functools
+import time
+from contextlib import contextmanager
+
+
+class Profiler:
+    # 轻量热路径埋点：命名计时器 (次数 / 总耗时 / 最大耗时) 与计数器
+    # 默认关闭，关闭时 timer / count 只做一次布尔判断，可常驻在环境方法中
+
+    def __init__(self):
+        self.enabled = False
+        self.timers = {}
+        self.counters = {}
+
+    def reset(self):
+        self.timers.clear()
+        self.counters.clear()
+
+    @contextmanager
+    def _timer(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            rec = self.timers.get(name)
+            if rec is None:
+                self.timers[name] = [1, dt, dt]
+            else:
+                rec[0] += 1
+                rec[1] += dt
+                rec[2] = max(rec[2], dt)
+
+    def timer(self, name):
+        return self._timer(name) if self.enabled else _NULL
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def snapshot(self):
+        # 可直接 JSON 序列化的统计快照
+        return {
+            'timers': {k: {'calls': c, 'total_s': t, 'max_s': m} for k, (c, t, m) in sorted(self.timers.items())},
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+
+class _NullContext:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullContext()
+
+# 全局埋点实例 (环境 / 扫描 / 规划方法统一上报到这里)
+PROFILER = Profiler()
+
+
+def timed(name):
+    # 方法装饰器：以 name 计时；functools.wraps 保留 __wrapped__，场景缓存哈希据此取原始字节码
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return fn(*args, **kwargs)
+            with PROFILER._timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
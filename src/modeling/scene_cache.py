@@ -0,0 +1,140 @@
+import hashlib
+import importlib
+import inspect
+import json
+import marshal
+import os
+import sys
+import time
+
+import numpy as np
+
+import scene_spec
+from chunked_grid import ChunkedGrid
+
+# 缓存格式版本：磁盘布局变化时递增，旧缓存自动失效
+CACHE_FORMAT = 1
+# 缓存目录固定在模块目录下，不随当前工作目录变化
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.scene_cache')
+
+
+def _default_env_cls():
+    return importlib.import_module('3d_voxel').VoxelEnvironment
+
+
+def _code_objects(namespace):
+    # 命名空间 (类 / 模块) 中全部函数的代码对象，按名称排序；带计时装饰器的先解包取原始函数
+    for name, obj in sorted(vars(namespace).items()):
+        obj = obj.__func__ if isinstance(obj, (classmethod, staticmethod)) else obj
+        if inspect.isfunction(obj):
+            yield inspect.unwrap(obj).__code__
+
+
+def scene_hash(env_cls, res, dims, builder='create_custom_scene', scene_bytes=b''):
+    # 场景定义的内容哈希：环境类与栅格化模块全部方法的字节码 (含全部常量) + 分辨率 + 尺寸
+    # (+ 场景描述文件内容)。构建函数经由多层辅助方法 (批量记录 / 栅格化) 写入网格，
+    # 因此对整个类取哈希而非只取个别方法，任何相关代码变化都会使缓存失效
+    # 用 marshal 序列化代码对象而非读取源码 (inspect.getsource 需数十毫秒)，哈希仅需微秒级
+    h = hashlib.sha256()
+    h.update(f"format={CACHE_FORMAT};res={res!r};dims={list(map(float, dims))};builder={builder}".encode())
+    for code in (*_code_objects(env_cls), *_code_objects(scene_spec)):
+        h.update(marshal.dumps(code))
+    h.update(scene_bytes)
+    return h.hexdigest()
+
+
+def save_scene(env, path, digest=''):
+    # 写入 <path>.npy (体素网格) 与 <path>.json (元数据)；先写临时文件再原子替换，
+    # 避免并发进程读到半写入的缓存
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    meta = {
+        'format': CACHE_FORMAT,
+        'hash': digest,
+        'res': env.res,
+        'dims': env.dims.tolist(),
+        'grid_shape': [int(v) for v in env.grid_shape],
+        'dtype': str(env.grid.dtype),
+        'start': env.start.tolist(),
+        'goal': env.goal.tolist(),
+    }
+    tmp = f"{path}.{os.getpid()}.tmp"
+    np.save(tmp + '.npy', np.ascontiguousarray(env.grid))
+    with open(tmp + '.json', 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp + '.npy', path + '.npy')
+    os.replace(tmp + '.json', path + '.json')
+
+
+def read_meta(path):
+    try:
+        with open(path + '.json') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_scene(path, env_cls=None, mmap_mode='c', storage='dense'):
+    # 以内存映射方式加载：默认 mmap_mode='c' 写时复制，页面在进程写入前与其它进程共享，
+    # 写入 (add_block / 扫描揭示迷雾) 只影响本进程、不写回磁盘；只读的工作进程可显式传 'r'，
+    # 此时网格不可写入；None 为完整读入内存
+    # storage='chunked' 时从映射逐砖块转为分块存储 (mmap_mode 不再起作用，结果为进程私有)
+    if storage not in ('dense', 'chunked'):
+        raise ValueError(f"未知的存储后端: {storage}")
+    env_cls = env_cls or _default_env_cls()
+    meta = read_meta(path)
+    if meta is None:
+        raise FileNotFoundError(f"场景缓存不存在: {path}")
+    width, depth, height = meta['dims']
+    env = env_cls(width, depth, height, res=meta['res'], storage=storage)
+    grid = np.load(path + '.npy', mmap_mode='r' if storage == 'chunked' else mmap_mode)
+    env.grid = ChunkedGrid.from_dense(grid) if storage == 'chunked' else grid
+    env.start = np.array(meta['start'])
+    env.goal = np.array(meta['goal'])
+    return env
+
+
+def load_or_build(res=0.5, dims=(130, 80, 30), env_cls=None, builder='create_custom_scene',
+                  cache_dir=DEFAULT_CACHE_DIR, mmap_mode='c', scene_file=None, storage='dense'):
+    # 命中缓存则直接内存映射加载；场景定义或分辨率变化 (哈希不一致) 时自动重建并写回
+    # scene_file: 声明式场景描述 (JSON)，给出时代替 builder 构建，文件内容计入哈希
+    # storage: 返回环境的存储后端；磁盘上始终为稠密网格，两种后端共用同一份缓存
+    env_cls = env_cls or _default_env_cls()
+    spec, scene_bytes, name = None, b'', builder
+    if scene_file is not None:
+        with open(scene_file, 'rb') as f:
+            scene_bytes = f.read()
+        spec = json.loads(scene_bytes)
+        dims = spec.get('dims', dims)
+        name = os.path.splitext(os.path.basename(scene_file))[0]
+    digest = scene_hash(env_cls, res, dims, builder if spec is None else 'scene_file', scene_bytes)
+    path = os.path.join(cache_dir, f"{name}_{str(res).replace('.', 'p')}")
+
+    meta = read_meta(path)
+    if meta is not None and meta.get('hash') == digest and os.path.exists(path + '.npy'):
+        return load_scene(path, env_cls, mmap_mode, storage)
+
+    if spec is None:
+        env = env_cls(*dims, res=res, storage=storage)
+        getattr(env, builder)()
+    else:
+        env = env_cls.from_scene(spec, res=res, storage=storage)
+    save_scene(env, path, digest)
+    return load_scene(path, env_cls, mmap_mode, storage)
+
+
+if __name__ == "__main__":
+    res = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    VoxelEnvironment = _default_env_cls()
+
+    t0 = time.perf_counter()
+    env = VoxelEnvironment(res=res)
+    env.create_custom_scene()
+    replay = time.perf_counter() - t0
+
+    load_or_build(res, env_cls=VoxelEnvironment)  # 确保缓存存在
+    t0 = time.perf_counter()
+    cached = load_or_build(res, env_cls=VoxelEnvironment)
+    load = time.perf_counter() - t0
+    assert np.array_equal(cached.grid, env.grid)
+    print(f"[场景缓存] res={res} | 网格: {tuple(env.grid_shape.tolist())} | 重放构建: {replay:.4f}s | "
+          f"映射加载: {load:.4f}s")